@@ -1,154 +1,122 @@
 import numpy as np
-from Edges import Edge, Graph
-import sys
+from numba import njit
 
+# neighbour bits of a subcell node, bit k belongs to movement k in stc_path_walk
+DOWN, LEFT, UP, RIGHT = 1, 2, 4, 8
 
-class CalculateTrajectories:
-    def __init__(self, r, c, MST):
-        self.MAX_NODES = 4*r*c
-        self.PathSequence = []
-        self.rows = r
-        self.cols = c
-        self.MSTvector = MST
-        self.MSTedges = len(self.MSTvector)
-        self.allEdges = set()
-        self.nodes = {}
-        for node in range(self.MAX_NODES):
-            self.nodes[node] = None
 
-    def initializeGraph(self, A, connect4):
-        for i in range(2*self.rows):
-            for j in range(2*self.cols):
-                if A[i, j]:
-                    if i > 0 and A[i-1][j]:
-                        self.AddToAllEdges(i*2*self.cols+j, (i-1)*2*self.cols+j, 1)
-                    if i < 2*self.rows-1 and A[i+1][j]:
-                        self.AddToAllEdges(i*2*self.cols+j, (i+1)*2*self.cols+j, 1)
-                    if j > 0 and A[i][j-1]:
-                        self.AddToAllEdges(i*2*self.cols+j, i*2*self.cols+j-1, 1)
-                    if j < 2*self.cols-1 and A[i][j+1]:
-                        self.AddToAllEdges(i*2*self.cols+j, i*2*self.cols+j+1, 1)
-
-                    if not connect4:
-                        if i > 0 and j > 0 and A[i-1][j-1]:
-                            self.AddToAllEdges(i*2*self.cols+j, (i-1)*2*self.cols+j-1, 1)
-                        if i < 2*self.rows-1 and j < 2*self.cols-1 and A[i+1][j+1]:
-                            self.AddToAllEdges(i*2*self.cols+j, (i+1)*2*self.cols+j+1, 1)
-                        if i > 2*self.rows-1 and j > 0 and A[i+1][j-1]:
-                            self.AddToAllEdges(i*2*self.cols+j, (i+1)*2*self.cols+j-1, 1)
-                        if i > 0 and j < 2*self.cols-1 and A[i-1][j+1]:
-                            self.AddToAllEdges(i*2*self.cols+j, (i-1)*2*self.cols+j+1, 1)
-
-    def AddToAllEdges(self, _from: int, to: int, cost):
-        self.allEdges.add(Edge(_from, to, cost))
-
-        if (self.nodes[_from]) is None:
-            self.nodes[_from] = set()
-
-        self.nodes[_from].add(to)
-
-        if (self.nodes[to]) is None:
-            self.nodes[to] = set()
-
-        self.nodes[to].add(_from)
+@njit("int32[:, :](uint8[:], int64, int64)", cache=True, nogil=True)
+def stc_path_walk(nodes: np.ndarray, starting_node: int, cols: int):
+    """
+    Walk around the MST on the subcell graph, always trying the directions in movement order starting with the
+    direction back to the previous node. Walked edges get removed from nodes (in place).
 
-    def RemoveTheAppropriateEdges(self):
-        for i in range(self.MSTedges):
-            e = self.MSTvector[i]
-            maxN = max(e.src, e.dst)
-            minN = min(e.src, e.dst)
-
-            if np.absolute(e.src - e.dst) == 1:
-                alpha = (4*minN+3) - 2*(maxN % self.cols)
-                eToRemove = Edge(alpha, alpha+2*self.cols, 1)
-                eToRemoveMirr = Edge(alpha+2*self.cols, alpha, 1)
-                eToRemove2 = Edge(alpha+1, alpha+1+2*self.cols, 1)
-                eToRemove2Mirr = Edge(alpha+1+2*self.cols, alpha+1, 1)
-
-            else:
-                alpha = (4*minN+2*self.cols) - 2*(maxN % self.cols)
-                eToRemove = Edge(alpha, alpha+1, 1)
-                eToRemoveMirr = Edge(alpha+1, alpha, 1)
-                eToRemove2 = Edge(alpha+2*self.cols, alpha+1+2*self.cols, 1)
-                eToRemove2Mirr = Edge(alpha+1+2*self.cols, alpha+2*self.cols, 1)
-
-            if eToRemove in self.allEdges:
-                self.SafeRemoveEdge(eToRemove)
-
-            if eToRemoveMirr in self.allEdges:
-                self.SafeRemoveEdge(eToRemoveMirr)
-
-            if eToRemove2 in self.allEdges:
-                self.SafeRemoveEdge(eToRemove2)
-
-            if eToRemove2Mirr in self.allEdges:
-                self.SafeRemoveEdge(eToRemove2Mirr)
-
-    def SafeRemoveEdge(self, curEdge):
-        try:
-            self.allEdges.remove(curEdge)
-            # successful removal from priority queue: allEdges
-            if curEdge.dst in self.nodes[curEdge.src]:
-                self.nodes[curEdge.src].remove(curEdge.dst)
-            if curEdge.src in self.nodes[curEdge.dst]:
-                self.nodes[curEdge.dst].remove(curEdge.src)
-
-        except KeyError:
-            # This is a serious problem
-            print("TreeSet should have contained this element!!")
-            sys.exit(1)
+    :param nodes: neighbour bits (DOWN, LEFT, UP, RIGHT) of every subcell node
 
-    def CalculatePathsSequence(self, StartingNode):
+    :param starting_node: subcell node id of the robot start position
 
-        currentNode = StartingNode
-        RemovedNodes = set()
-        movement = []
-        PathSequence = []
+    :param cols: number of DARP columns (the subcell grid has 2*cols columns)
 
-        movement.append(2*self.cols)
-        movement.append(-1)
-        movement.append(-2*self.cols)
-        movement.append(1)
+    :return: (N x 4) array of moves: previous row, previous column, row, column
+    """
+    width = 2*cols
+    movement = np.array([width, -1, -width, 1], dtype=np.int64)
 
-        found = False
-        prevNode = 0
-        for idx in range(4):
-            if (currentNode + movement[idx]) in list(self.nodes[currentNode]):
-                prevNode = currentNode + movement[idx]
-                found = True
-                break
+    # every move removes one edge, so the number of edges bounds the path length
+    edge_bits = 0
+    for n in range(len(nodes)):
+        edge_bits += (nodes[n] & 1) + ((nodes[n] >> 1) & 1) + ((nodes[n] >> 2) & 1) + ((nodes[n] >> 3) & 1)
+    path = np.empty((edge_bits // 2, 4), dtype=np.int32)
+    path_length = 0
+
+    removed_nodes = np.zeros(len(nodes), dtype=np.bool_)
+    current_node = starting_node
 
-        if not found:
-            return
+    # start searching with the direction of the first neighbour
+    offset = -1
+    for idx in range(4):
+        if nodes[current_node] & (1 << idx):
+            offset = idx
+            break
+    if offset < 0:
+        return path[:0]
 
-        while True:
-            if currentNode != StartingNode:
-                RemovedNodes.add(currentNode)
+    while True:
+        if current_node != starting_node:
+            removed_nodes[current_node] = True
 
-            offset = movement.index(prevNode-currentNode)
+        prev_node = current_node
 
-            prevNode = currentNode
+        direction = -1
+        for idx in range(4):
+            candidate = (idx + offset) % 4
+            if (nodes[prev_node] & (1 << candidate)) and not removed_nodes[prev_node + movement[candidate]]:
+                direction = candidate
+                break
 
-            found = False
-            for idx in range(4):
-                if (prevNode+movement[(idx+offset) % 4] in self.nodes[prevNode]) and not (prevNode+movement[(idx+offset) % 4] in RemovedNodes):
+        if direction < 0:
+            return path[:path_length]
 
-                    currentNode = prevNode + movement[(idx+offset) % 4]
-                    found = True
-                    break
+        current_node = prev_node + movement[direction]
+        nodes[prev_node] &= ~(1 << direction)
+        nodes[current_node] &= ~(1 << ((direction + 2) % 4))
+        offset = (direction + 2) % 4
 
-            if not found:
-                return
+        path[path_length, 0] = prev_node // width
+        path[path_length, 1] = prev_node % width
+        path[path_length, 2] = current_node // width
+        path[path_length, 3] = current_node % width
+        path_length += 1
 
-            if prevNode in self.nodes[currentNode]:
-                self.nodes[currentNode].remove(prevNode)
 
-            if currentNode in self.nodes[prevNode]:
-                self.nodes[prevNode].remove(currentNode)
+class CalculateTrajectories:
+    def __init__(self, r, c, MST):
+        self.MAX_NODES = 4*r*c
+        self.PathSequence = np.zeros((0, 4), dtype=np.int32)
+        self.rows = r
+        self.cols = c
+        self.MSTvector = MST
+        self.MSTedges = len(self.MSTvector)
+        # 4-direction neighbour bits (DOWN, LEFT, UP, RIGHT) of every subcell node
+        self.nodes = np.zeros(self.MAX_NODES, dtype=np.uint8)
+
+    def initializeGraph(self, A, connect4):
+        """
+        Set the neighbour bits of all neighboured subcell pairs inside the region A (2*rows x 2*cols).
+
+        The coverage path only moves in 4 directions, diagonal neighbours (connect4 False) are never walked and
+        therefore not stored in the bitmask.
+        """
+        region = np.asarray(A, dtype=bool)
+        nodes = np.zeros((2*self.rows, 2*self.cols), dtype=np.uint8)
+        nodes[:-1, :] |= (region[:-1, :] & region[1:, :]) * np.uint8(DOWN)
+        nodes[:, 1:] |= (region[:, 1:] & region[:, :-1]) * np.uint8(LEFT)
+        nodes[1:, :] |= (region[1:, :] & region[:-1, :]) * np.uint8(UP)
+        nodes[:, :-1] |= (region[:, :-1] & region[:, 1:]) * np.uint8(RIGHT)
+        self.nodes = nodes.reshape(-1)
 
-            i = int(currentNode/(2*self.cols))
-            j = currentNode % (2*self.cols)
-            previ = int(prevNode/(2*self.cols))
-            prevj = prevNode % (2*self.cols)
-            self.PathSequence.append((previ, prevj, i, j))
+    def RemoveTheAppropriateEdges(self):
+        """
+        Remove the subcell edges crossed by the MST edges as vectorized bit clears on both nodes of an edge.
+        """
+        src = self.MSTvector[:, 0].astype(np.int64)
+        dst = self.MSTvector[:, 1].astype(np.int64)
+        maxN = np.maximum(src, dst)
+        minN = np.minimum(src, dst)
+        # side by side means same tile row; |src - dst| == 1 would also match vertical edges of 1 column windows
+        horizontal = (src // self.cols) == (dst // self.cols)
+
+        # MST edge between tiles side by side: remove the two vertical subcell edges in between
+        alpha = (4*minN[horizontal]+3) - 2*(maxN[horizontal] % self.cols)
+        for node in (alpha, alpha+1):
+            self.nodes[node] &= np.uint8(~DOWN & 0xFF)
+            self.nodes[node+2*self.cols] &= np.uint8(~UP & 0xFF)
+
+        # MST edge between tiles on top of each other: remove the two horizontal subcell edges in between
+        alpha = (4*minN[~horizontal]+2*self.cols) - 2*(maxN[~horizontal] % self.cols)
+        for node in (alpha, alpha+2*self.cols):
+            self.nodes[node] &= np.uint8(~RIGHT & 0xFF)
+            self.nodes[node+1] &= np.uint8(~LEFT & 0xFF)
 
+    def CalculatePathsSequence(self, StartingNode):
+        self.PathSequence = stc_path_walk(self.nodes, int(StartingNode), self.cols)
@@ -1,36 +1,82 @@
 from pathlib import Path
 from darp import DARP
 import numpy as np
-from kruskal import Kruskal
+from kruskal import Kruskal, MST_MODES
 from CalculateTrajectories import CalculateTrajectories
-from Visualization import visualize_paths
-import sys
-from turns import turns
-import matplotlib.pyplot as plt
+from boustrophedon import boustrophedon_path
+from path_collection import PathCollection
+from disk_cache import DiskCache
+import instrumentation
+from turns import turns, path_statistics, take_statistics
 import os
-import moviepy.editor as mp
 import time
+import numba
+from functools import cached_property
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+
+# raise to invalidate all cached results after a change of DARP or the path planning
+RESULT_CACHE_VERSION = 2
+
+
+def problem_fingerprint(np_bool_area: np.ndarray, dict_darp_start: dict, max_iter, cc_variation, random_level,
+                        dynamic_cells, seed, importance, geodesic_metric, boustrophedon, boustrophedon_max_transit_ratio):
+    """
+    Cache key of a DARP + path planning problem, all inputs which determine the result for a fixed seed.
+    """
+    area = np.ascontiguousarray(np_bool_area, dtype=bool)
+    start_parameters = [(int(v['row']), int(v['col']), int(v['tiles_count'])) for v in dict_darp_start.values()]
+    return DiskCache.make_key('darp', RESULT_CACHE_VERSION, area.shape, area.tobytes(), start_parameters,
+                              int(max_iter), float(cc_variation), float(random_level), int(dynamic_cells), int(seed),
+                              bool(importance), bool(geodesic_metric), bool(boustrophedon),
+                              float(boustrophedon_max_transit_ratio))
 
 
 class MultiRobotPathPlanner(DARP):
     def __init__(self, np_bool_area: np.ndarray, max_iter: np.uint32, cc_variation: float, random_level: float,
                  dynamic_cells: np.uint32, dict_darp_start: dict, seed, importance: bool, visualization,
-                 image_export, video_export, export_file_name):
+                 image_export, video_export, export_file_name, geodesic_metric=False, video_frame_stride=5,
+                 video_downscale=1, video_max_frames=None, trace_export=False, boustrophedon=False,
+                 boustrophedon_max_transit_ratio=0.1, result_cache: DiskCache = None, subcell_length_meter=1.0,
+                 speed_meter_per_second=1.0, turn_duration_seconds=0.0):
 
         start_time = time.time()
+        self.export_file_name = export_file_name
+        # mission time estimation: one move is one subcell (the scanner line width) long
+        self.mission_parameters = {'subcell_length': subcell_length_meter, 'speed': speed_meter_per_second,
+                                   'turn_duration': turn_duration_seconds}
+
+        # DARP is only deterministic with a seed, only then results get cached (keyed by self.cache_key)
+        self.cache_key = None
+        if result_cache is not None and seed is not None and seed > 0:
+            self.cache_key = problem_fingerprint(np_bool_area, dict_darp_start, max_iter, cc_variation, random_level,
+                                                 dynamic_cells, seed, importance, geodesic_metric, boustrophedon,
+                                                 boustrophedon_max_transit_ratio)
+            cached_result = result_cache.load(self.cache_key)
+            if cached_result is not None:
+                instrumentation.count('darp.cache_hits')
+                self.restore_cached_result(cached_result, image_export and len(dict_darp_start) > 1)
+                self.execution_time = time.time() - start_time
+                return
 
         self.darp_instance = DARP(np_bool_area, max_iter, cc_variation, random_level, dynamic_cells, dict_darp_start,
-                                  seed, importance, visualization, video_export, export_file_name)
-        self.export_file_name = export_file_name
+                                  seed, importance, visualization, video_export, export_file_name, geodesic_metric,
+                                  video_frame_stride, video_downscale, video_max_frames, trace_export)
 
         # start dividing regions
         measure_start = time.time()
-        self.darp_success, self.iterations = self.darp_instance.divideRegions()
+        with instrumentation.span('darp.iterations'):
+            self.darp_success, self.iterations = self.darp_instance.divideRegions()
+        self.A = self.darp_instance.A
         measure_end = time.time()
         print("Elapsed time divideRegions(): ", (measure_end - measure_start), "sec")
 
         if not self.darp_success:
             print("DARP did not manage to find a solution for the given configuration!")
+            instrumentation.count('darp.failures')
+            if self.cache_key is not None:
+                # a failed run takes all iterations, remember it as well
+                result_cache.store(self.cache_key, {'darp_success': False, 'iterations': self.iterations})
 
         else:
             # don't let every darp execution write an image, only if darp actually does anything the image gets written
@@ -42,129 +88,113 @@ class MultiRobotPathPlanner(DARP):
                 # self.to_video()  # enable when moviepy is fixed; current 1.0.3 use_clip_fps_by_default method broken
 
 
-            # Iterate for 4 different ways to join edges in MST
+            # build the graph of every robot region once, the modes only reweight its edges
+            with instrumentation.span('paths.robot_graphs'):
+                robot_graphs = self.initializeRobotGraphs(self.darp_instance.BinaryRobotRegions,
+                                                          len(self.darp_instance.init_robot_pos),
+                                                          self.darp_instance.rows, self.darp_instance.cols)
+
+            # Construct the paths of every robot for the 4 different ways to join edges in MST, all robot-mode jobs
+            # are independent and run in a thread pool (the numba kernels release the GIL)
+            droneNo = len(self.darp_instance.init_robot_pos)
+            real_binary_regions = [self.CalcRealBinaryReg(self.darp_instance.BinaryRobotRegions[r,
+                                                          k.row_offset:k.row_offset + k.rows,
+                                                          k.col_offset:k.col_offset + k.cols], k.rows, k.cols)
+                                   for r, k in enumerate(robot_graphs)]
+            job_paths = {mode: [None] * droneNo for mode in range(len(MST_MODES))}
+
+            # convex robot regions get a lawn-mower sweep as candidate, it only replaces the STC path if it is better
+            sweep_paths = [None] * droneNo
+            if boustrophedon:
+                for r, k in enumerate(robot_graphs):
+                    with instrumentation.span('paths.boustrophedon'):
+                        sweep_paths[r] = self.calculateSweepPath(k, real_binary_regions[r],
+                                                                 self.darp_instance.init_robot_pos[r],
+                                                                 boustrophedon_max_transit_ratio)
+
+            # the best path of a robot gets selected as soon as the jobs of all its modes are finished,
+            # index best_modes[r] * droneNo + r of all_paths or len(MST_MODES) for its sweep path
+            best_modes = np.zeros(droneNo, dtype=np.int64)
+            unfinished_modes = [len(MST_MODES)] * droneNo
+            # as many threads as numba may use in this process, a worker of a tile group pool only gets its share
+            with ThreadPoolExecutor(max_workers=max(1, min(droneNo * len(MST_MODES), numba.get_num_threads()))) \
+                    as executor:
+                futures = {executor.submit(self.calculateRobotPath, robot_graphs[r], real_binary_regions[r],
+                                           self.darp_instance.init_robot_pos[r], mode): (r, mode)
+                           for mode in range(len(MST_MODES)) for r in range(droneNo)}
+                for future in as_completed(futures):
+                    r, mode = futures[future]
+                    job_paths[mode][r] = future.result()
+                    unfinished_modes[r] -= 1
+                    if unfinished_modes[r] == 0:
+                        best_modes[r] = self.selectBestMode([job_paths[mode][r] for mode in range(len(MST_MODES))],
+                                                            sweep_paths[r])
+            if boustrophedon:
+                print(f'Boustrophedon sweep paths for {np.count_nonzero(best_modes == len(MST_MODES))} of {droneNo} '
+                      f'robots')
+
+            # one contiguous collection of all paths, path index mode * droneNo + robot, the sweep paths behind them
+            # (mode len(MST_MODES), empty if a robot has none)
+            all_paths = PathCollection.from_paths([path for mode in range(len(MST_MODES)) for path in job_paths[mode]] +
+                                                  [path if path is not None else np.zeros((0, 4), dtype=np.int32)
+                                                   for path in sweep_paths])
+            mode_path_indices = [np.arange(mode * droneNo, (mode + 1) * droneNo) for mode in range(len(MST_MODES))]
+            AllRealPaths_dict = {mode: all_paths.select(mode_path_indices[mode]) for mode in range(len(MST_MODES))}
+
+            # turns, lengths and mission times of all robots in all modes in one pass, shape (modes, robots)
+            with instrumentation.span('paths.statistics'):
+                statistics = path_statistics(all_paths, **self.mission_parameters)
+            statistics_per_mode = [take_statistics(statistics, mode_path_indices[mode]) for mode in range(len(MST_MODES))]
+            best_path_indices = best_modes * droneNo + np.arange(droneNo)
+
+            # subcell line types and assignment are only needed for visualization, see the lazy properties
+            self.AllRealPaths_dict = AllRealPaths_dict
             self.mode_to_drone_turns = []
-            AllRealPaths_dict = {}
-            subCellsAssignment_dict = {}
-            for mode in range(4):
-                MSTs = self.calculateMSTs(self.darp_instance.BinaryRobotRegions, len(self.darp_instance.init_robot_pos),
-                                          self.darp_instance.rows, self.darp_instance.cols, mode)
-                AllRealPaths = []
-                for r in range(len(self.darp_instance.init_robot_pos)):
-                    ct = CalculateTrajectories(self.darp_instance.rows, self.darp_instance.cols, MSTs[r])
-                    ct.initializeGraph(
-                        self.CalcRealBinaryReg(self.darp_instance.BinaryRobotRegions[r], self.darp_instance.rows,
-                                               self.darp_instance.cols), True)
-                    ct.RemoveTheAppropriateEdges()
-                    ct.CalculatePathsSequence(
-                        4 * self.darp_instance.init_robot_pos[r][0] * self.darp_instance.cols + 2 *
-                        self.darp_instance.init_robot_pos[r][1])
-                    AllRealPaths.append(ct.PathSequence)
-
-                self.TypesOfLines = np.zeros((self.darp_instance.rows * 2, self.darp_instance.cols * 2, 2))
-                for r in range(len(self.darp_instance.init_robot_pos)):
-                    flag = False
-                    for connection in AllRealPaths[r]:
-                        if flag:
-                            if self.TypesOfLines[connection[0]][connection[1]][0] == 0:
-                                indxadd1 = 0
-                            else:
-                                indxadd1 = 1
-
-                            if self.TypesOfLines[connection[2]][connection[3]][0] == 0 and flag:
-                                indxadd2 = 0
-                            else:
-                                indxadd2 = 1
-                        else:
-                            if not (self.TypesOfLines[connection[0]][connection[1]][0] == 0):
-                                indxadd1 = 0
-                            else:
-                                indxadd1 = 1
-                            if not (self.TypesOfLines[connection[2]][connection[3]][0] == 0 and flag):
-                                indxadd2 = 0
-                            else:
-                                indxadd2 = 1
-
-                        flag = True
-                        if connection[0] == connection[2]:
-                            if connection[1] > connection[3]:
-                                self.TypesOfLines[connection[0]][connection[1]][indxadd1] = 2
-                                self.TypesOfLines[connection[2]][connection[3]][indxadd2] = 3
-                            else:
-                                self.TypesOfLines[connection[0]][connection[1]][indxadd1] = 3
-                                self.TypesOfLines[connection[2]][connection[3]][indxadd2] = 2
-
-                        else:
-                            if connection[0] > connection[2]:
-                                self.TypesOfLines[connection[0]][connection[1]][indxadd1] = 1
-                                self.TypesOfLines[connection[2]][connection[3]][indxadd2] = 4
-                            else:
-                                self.TypesOfLines[connection[0]][connection[1]][indxadd1] = 4
-                                self.TypesOfLines[connection[2]][connection[3]][indxadd2] = 1
-
-                subCellsAssignment = np.zeros((2 * self.darp_instance.rows, 2 * self.darp_instance.cols))
-                for i in range(self.darp_instance.rows):
-                    for j in range(self.darp_instance.cols):
-                        subCellsAssignment[2 * i][2 * j] = self.darp_instance.A[i][j]
-                        subCellsAssignment[2 * i + 1][2 * j] = self.darp_instance.A[i][j]
-                        subCellsAssignment[2 * i][2 * j + 1] = self.darp_instance.A[i][j]
-                        subCellsAssignment[2 * i + 1][2 * j + 1] = self.darp_instance.A[i][j]
-
-                drone_turns = turns(AllRealPaths)
-                drone_turns.count_turns()
+            for mode in range(len(MST_MODES)):
+                drone_turns = turns(AllRealPaths_dict[mode])
+                drone_turns.set_statistics(statistics_per_mode[mode])
                 drone_turns.find_avg_and_std()
                 self.mode_to_drone_turns.append(drone_turns)
 
-                AllRealPaths_dict[mode] = AllRealPaths
-                subCellsAssignment_dict[mode] = subCellsAssignment
-
             # Find mode with the smaller number of turns
             averge_turns = [x.avg for x in self.mode_to_drone_turns]
             self.min_mode = averge_turns.index(min(averge_turns))
 
             # Retrieve number of cells per robot for the configuration with the smaller number of turns
-            min_mode_num_paths = [len(x) for x in AllRealPaths_dict[self.min_mode]]
+            min_mode_num_paths = AllRealPaths_dict[self.min_mode].lengths.tolist()
             min_mode_returnPaths = AllRealPaths_dict[self.min_mode]
 
             # Uncomment if you want to visualize all available modes
 
             # if self.darp_instance.visualization:
             #     for mode in range(4):
-            #         image = visualize_paths(AllRealPaths_dict[mode], subCellsAssignment_dict[mode],
+            #         image = visualize_paths(AllRealPaths_dict[mode], self.subCellsAssignment,
             #                                 self.darp_instance.droneNo, self.darp_instance.color)
             #         image.visualize_paths(mode)
             #     print("Best Mode:", self.min_mode)
 
             # Combine all modes to get one mode with the least available turns for each drone
-            combined_modes_paths = []
-            combined_modes_turns = []
-
-            for r in range(len(self.darp_instance.init_robot_pos)):
-                min_turns = sys.maxsize
-                temp_path = []
-                for mode in range(4):
-                    if self.mode_to_drone_turns[mode].turns[r] < min_turns:
-                        temp_path = self.mode_to_drone_turns[mode].paths[r]
-                        min_turns = self.mode_to_drone_turns[mode].turns[r]
-                combined_modes_paths.append(temp_path)
-                combined_modes_turns.append(min_turns)
-
-            self.best_case = turns(combined_modes_paths)
-            self.best_case.turns = combined_modes_turns
+            self.best_case = turns(all_paths.select(best_path_indices))
+            self.best_case.set_statistics(take_statistics(statistics, best_path_indices))
             self.best_case.find_avg_and_std()
 
             # Retrieve number of cells per robot for the best case configuration
-            best_case_num_paths = [len(x) for x in self.best_case.paths]
+            best_case_num_paths = self.best_case.paths.lengths.tolist()
             best_case_returnPaths = self.best_case.paths
 
             # visualize best case
             if self.darp_instance.visualization:
-                image = visualize_paths(self.best_case.paths, subCellsAssignment_dict[self.min_mode],
+                from Visualization import visualize_paths
+                image = visualize_paths(self.best_case.paths, self.subCellsAssignment,
                                         len(self.darp_instance.init_robot_pos), self.darp_instance.color)
                 image.visualize_paths("Combined Modes")
 
             self.execution_time = time.time() - start_time
 
+            if self.cache_key is not None:
+                result_cache.store(self.cache_key, {'darp_success': True, 'iterations': self.iterations, 'A': self.A,
+                                                    'best_paths': self.best_case.paths})
+
             if len(best_case_returnPaths) > 0:
                 print(f'\nResults for "{export_file_name}" tiles group:')
                 print(f'Number of cells per robot: {best_case_num_paths}')
@@ -177,36 +207,175 @@ class MultiRobotPathPlanner(DARP):
                       f'the best path for "{export_file_name}" tiles group!')
                 print("self.best_case.paths doesn't hold paths tuples!")
 
-    def CalcRealBinaryReg(self, BinaryRobotRegion, rows, cols):
-        temp = np.zeros((2 * rows, 2 * cols))
-        RealBinaryRobotRegion = np.zeros((2 * rows, 2 * cols), dtype=bool)
-        for i in range(2 * rows):
-            for j in range(2 * cols):
-                temp[i, j] = BinaryRobotRegion[(int(i / 2))][(int(j / 2))]
-                if temp[i, j] == 0:
-                    RealBinaryRobotRegion[i, j] = False
+    def restore_cached_result(self, cached_result: dict, image_export: bool):
+        """
+        Take DARP success, final assignment matrix A and best paths from the cache instead of computing them. A restored
+        handle has no darp_instance and no paths of the single modes.
+        """
+        self.darp_instance = None
+        self.darp_success = cached_result['darp_success']
+        self.iterations = cached_result['iterations']
+        print(f'Reusing cached result for "{self.export_file_name}" tiles group')
+
+        if not self.darp_success:
+            print("DARP did not manage to find a solution for the given configuration!")
+            return
+
+        self.A = cached_result['A']
+        self.best_case = turns(cached_result['best_paths'])
+        self.best_case.set_statistics(path_statistics(self.best_case.paths, **self.mission_parameters))
+        self.best_case.find_avg_and_std()
+
+        if image_export:
+            self.to_image()
+
+        print(f'Number of cells per robot: {self.best_case.paths.lengths.tolist()}')
+        print(f'\nTurns Analysis for: {self.best_case}')
+
+    @cached_property
+    def TypesOfLines(self):
+        """
+        Line types of the subcells along the paths of the last mode, only computed when accessed.
+        """
+        AllRealPaths = self.AllRealPaths_dict[len(MST_MODES) - 1]
+        TypesOfLines = np.zeros((self.darp_instance.rows * 2, self.darp_instance.cols * 2, 2))
+        for r in range(len(self.darp_instance.init_robot_pos)):
+            flag = False
+            for connection in AllRealPaths[r]:
+                if flag:
+                    if TypesOfLines[connection[0]][connection[1]][0] == 0:
+                        indxadd1 = 0
+                    else:
+                        indxadd1 = 1
+
+                    if TypesOfLines[connection[2]][connection[3]][0] == 0 and flag:
+                        indxadd2 = 0
+                    else:
+                        indxadd2 = 1
                 else:
-                    RealBinaryRobotRegion[i, j] = True
+                    if not (TypesOfLines[connection[0]][connection[1]][0] == 0):
+                        indxadd1 = 0
+                    else:
+                        indxadd1 = 1
+                    if not (TypesOfLines[connection[2]][connection[3]][0] == 0 and flag):
+                        indxadd2 = 0
+                    else:
+                        indxadd2 = 1
+
+                flag = True
+                if connection[0] == connection[2]:
+                    if connection[1] > connection[3]:
+                        TypesOfLines[connection[0]][connection[1]][indxadd1] = 2
+                        TypesOfLines[connection[2]][connection[3]][indxadd2] = 3
+                    else:
+                        TypesOfLines[connection[0]][connection[1]][indxadd1] = 3
+                        TypesOfLines[connection[2]][connection[3]][indxadd2] = 2
 
-        return RealBinaryRobotRegion
+                else:
+                    if connection[0] > connection[2]:
+                        TypesOfLines[connection[0]][connection[1]][indxadd1] = 1
+                        TypesOfLines[connection[2]][connection[3]][indxadd2] = 4
+                    else:
+                        TypesOfLines[connection[0]][connection[1]][indxadd1] = 4
+                        TypesOfLines[connection[2]][connection[3]][indxadd2] = 1
+
+        return TypesOfLines
+
+    @cached_property
+    def subCellsAssignment(self):
+        """
+        Assignment matrix upsampled to the subcells (2x2 per tile), only computed when accessed.
+        """
+        return np.repeat(np.repeat(self.A, 2, axis=0), 2, axis=1).astype(float)
+
+    def CalcRealBinaryReg(self, BinaryRobotRegion, rows, cols):
+        return np.repeat(np.repeat(BinaryRobotRegion[:rows, :cols], 2, axis=0), 2, axis=1).astype(bool)
 
-    def calculateMSTs(self, BinaryRobotRegions, droneNo, rows, cols, mode):
-        MSTs = []
+    def initializeRobotGraphs(self, BinaryRobotRegions, droneNo, rows, cols):
+        """
+        Build the graph of every robot only on the bounding box of its region, a robot owns about 1/droneNo of the grid.
+        """
+        robot_graphs = []
         for r in range(droneNo):
-            k = Kruskal(rows, cols)
-            k.initializeGraph(BinaryRobotRegions[r, :, :], True, mode)
-            k.performKruskal()
-            MSTs.append(k.mst)
-        return MSTs
+            region_rows = np.flatnonzero(BinaryRobotRegions[r].any(axis=1))
+            region_cols = np.flatnonzero(BinaryRobotRegions[r].any(axis=0))
+            row_offset, col_offset = region_rows[0], region_cols[0]
+            window_rows = region_rows[-1] - row_offset + 1
+            window_cols = region_cols[-1] - col_offset + 1
+
+            k = Kruskal(window_rows, window_cols, row_offset, col_offset, rows, cols)
+            k.initializeGraph(BinaryRobotRegions[r, row_offset:row_offset + window_rows,
+                                                 col_offset:col_offset + window_cols], True)
+            robot_graphs.append(k)
+        return robot_graphs
+
+    def calculateRobotPath(self, robot_graph, real_binary_region, init_robot_pos, mode):
+        """
+        One robot-mode job: MST of the robot region for the mode and the STC path around it.
+        The path gets computed inside the cropped window of the robot graph and is offset back to the subcell grid.
+        """
+        with instrumentation.span('paths.mst'):
+            mst = robot_graph.performKruskal(mode)
+        with instrumentation.span('paths.stc_walk'):
+            ct = CalculateTrajectories(robot_graph.rows, robot_graph.cols, mst)
+            ct.initializeGraph(real_binary_region, True)
+            ct.RemoveTheAppropriateEdges()
+            ct.CalculatePathsSequence(4 * (init_robot_pos[0] - robot_graph.row_offset) * robot_graph.cols +
+                                      2 * (init_robot_pos[1] - robot_graph.col_offset))
+
+        path = ct.PathSequence
+        path[:, [0, 2]] += 2 * robot_graph.row_offset
+        path[:, [1, 3]] += 2 * robot_graph.col_offset
+        return path
+
+    def selectBestMode(self, mode_paths, sweep_path=None):
+        """
+        Mode of the robot path with the fewest turns, the lower mode on equal turns. The sweep path only wins if it is
+        strictly better than the path of this mode: neither more turns nor a longer mission time, and less of one.
+
+        :param mode_paths: STC path of the robot per mode
+
+        :param sweep_path: boustrophedon path of the robot or None
+
+        :return: the mode, len(mode_paths) for the sweep path
+        """
+        candidates = list(mode_paths) if sweep_path is None else list(mode_paths) + [sweep_path]
+        statistics = path_statistics(candidates, **self.mission_parameters)
+        best_mode = int(np.argmin(statistics['turns'][:len(mode_paths)]))
+        if sweep_path is None:
+            return best_mode
+
+        sweep = len(mode_paths)
+        turns_and_time = np.array([statistics['turns'], statistics['mission_time']])
+        if np.all(turns_and_time[:, sweep] <= turns_and_time[:, best_mode]) and \
+                np.any(turns_and_time[:, sweep] < turns_and_time[:, best_mode]):
+            return sweep
+        return best_mode
+
+    def calculateSweepPath(self, robot_graph, real_binary_region, init_robot_pos, max_transit_ratio):
+        """
+        Boustrophedon path of a robot region inside the cropped window of its graph, offset back to the subcell grid.
+        None if the region is not convex enough for a sweep. Unlike the closed STC path around the MST, a sweep path
+        ends at the far side of the region and doesn't return to the start.
+        """
+        path = boustrophedon_path(real_binary_region, (2 * (init_robot_pos[0] - robot_graph.row_offset),
+                                                       2 * (init_robot_pos[1] - robot_graph.col_offset)),
+                                  max_transit_ratio)
+        if path is not None:
+            path[:, [0, 2]] += 2 * robot_graph.row_offset
+            path[:, [1, 3]] += 2 * robot_graph.col_offset
+        return path
 
     def to_image(self):
+        import matplotlib.pyplot as plt
         file_path = Path('result_export', self.export_file_name + ".jpg")
         if not file_path.parent.exists():
             os.makedirs(file_path.parent)
-        plt.imsave(file_path, self.darp_instance.A, dpi=100)
+        plt.imsave(file_path, self.A, dpi=100)
         print("Exported image of final assignment matrix")
 
     def to_video(self):
+        import moviepy.editor as mp
         # existing gif in results_export folder?
         num_of_processes = os.cpu_count() - 1
         clip = mp.VideoFileClip("./result_export/" + self.export_file_name + ".gif")
@@ -0,0 +1,107 @@
+import os
+from pathlib import Path
+import geopandas as gpd
+import pandas
+from shapely.geometry import Point
+from disk_cache import DiskCache
+
+
+# sources in lookup priority: a name found in an earlier source hides the same name in later ones
+AREA_SOURCES = [('dams_single_geojsons', Path('dams_single_geojsons')),
+                ('water_only', Path('overall_geojsons', 'water_only.geojson'))]
+CATALOG_COLUMNS = ['name', 'source', 'landuse', 'natural', 'water', 'geometry']
+CATALOG_CACHE_DIRECTORY = os.path.join('.', 'cache', 'area_catalog')
+
+
+class AreaCatalog:
+    """
+    All water areas of the GeoJSON sources in one GeoDataFrame, parsed once and kept as binary store in the cache (it
+    gets rebuilt when a source file changes).
+
+    Lookup by name, an R-tree over the area bounds to find the water body of a point and the biggest polygon of an
+    area, which is computed only once per name.
+    """
+
+    def __init__(self, sources=None, cache_directory: str = CATALOG_CACHE_DIRECTORY):
+        self.sources = AREA_SOURCES if sources is None else sources
+        # (source name, file, the file holds one area named like the file)
+        self.source_files = [(source_name, file_path, source_path.is_dir()) for source_name, source_path in self.sources
+                             for file_path in self.__geojson_files(source_path)]
+
+        cache = DiskCache(cache_directory, 64 * 2 ** 20)
+        cache_key = DiskCache.make_key('area_catalog', [(source_name, str(file_path), os.stat(file_path).st_mtime_ns,
+                                                         os.stat(file_path).st_size)
+                                                        for source_name, file_path, _ in self.source_files])
+        self.areas: gpd.GeoDataFrame = cache.load(cache_key)
+        if self.areas is None:
+            print("Building area catalog from", len(self.source_files), "GeoJSON files...")
+            self.areas = self.__parse_sources()
+            cache.store(cache_key, self.areas)
+
+        self.__biggest_polygons = {}
+
+    @staticmethod
+    def __geojson_files(source_path: Path):
+        if source_path.is_dir():
+            return sorted(source_path.glob('*.geojson'))
+        return [source_path] if source_path.exists() else []
+
+    def __parse_sources(self):
+        parts = []
+        for source_name, file_path, named_by_file in self.source_files:
+            gdf = gpd.read_file(file_path).to_crs(4326)
+            if named_by_file:
+                gdf['name'] = file_path.stem
+            gdf['source'] = source_name
+            parts.append(gdf.reindex(columns=CATALOG_COLUMNS))
+
+        areas = gpd.GeoDataFrame(pandas.concat(parts, axis=0, ignore_index=True), crs=4326)
+        areas = areas[areas.geom_type.isin(['Polygon', 'MultiPolygon']) & ~areas.geometry.is_empty]
+        areas = areas[areas['name'].notnull()].reset_index(drop=True)
+        areas['name'] = areas['name'].astype(str)
+        return areas
+
+    def names(self):
+        return self.areas['name'].unique().tolist()
+
+    def lookup(self, name: str):
+        """
+        :return: GeoDataFrame of all entries with the name of the first source containing it (can be empty)
+        """
+        matches = self.areas[self.areas['name'] == name]
+        if matches.empty:
+            return matches
+        return matches[matches['source'] == matches['source'].iloc[0]]
+
+    def biggest_polygon(self, name: str):
+        """
+        Biggest single Polygon of the area with the given name (of its first source), memoized.
+        """
+        if name not in self.__biggest_polygons:
+            matches = self.lookup(name)
+            if matches.empty:
+                raise KeyError(f'No area named "{name}" in the area catalog')
+            exploded = matches.geometry.explode(index_parts=True)
+            self.__biggest_polygons[name] = max(exploded, key=lambda a: a.area)
+        return self.__biggest_polygons[name]
+
+    def areas_containing(self, longitude: float, latitude: float):
+        """
+        :return: GeoDataFrame of all areas containing the point, found via the R-tree over the area bounds
+        """
+        point = Point(longitude, latitude)
+        candidates = self.areas.iloc[self.areas.sindex.query(point)]
+        return candidates[candidates.geometry.contains(point)]
+
+
+_catalog = None
+
+
+def area_catalog():
+    """
+    :return: the area catalog of this process, loaded on first use
+    """
+    global _catalog
+    if _catalog is None:
+        _catalog = AreaCatalog()
+    return _catalog
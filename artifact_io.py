@@ -0,0 +1,107 @@
+import os
+from pathlib import Path
+import geopandas as gpd
+import pandas
+import instrumentation
+
+
+# artifacts between the stages, named {file_name}_{kind}.parquet, e.g. 2022-07-01_12-00-00_TalsperreMalter_grid.parquet
+ARTIFACT_FOLDER = Path('geodataframes')
+ARTIFACT_SUFFIX = '.parquet'  # binary columnar GeoParquet, default between the stages
+GEOJSON_SUFFIX = '.geojson'  # text export for interchange with other programs
+
+
+def write_artifact(gdf: gpd.GeoDataFrame, file_name: str, kind: str, geojson_export: bool = False,
+                   folder: Path = ARTIFACT_FOLDER):
+    """
+    Save a stage result as GeoParquet and, if wanted, additionally as GeoJSON.
+
+    :param kind: artifact type, e.g. 'grid', 'subcells_and_lines_collection' or 'path_per_tilegroup'
+
+    :param geojson_export: also write {file_name}_{kind}.geojson
+
+    :return: path of the GeoParquet file
+    """
+    os.makedirs(folder, exist_ok=True)
+    file_path = Path(folder, f'{file_name}_{kind}{ARTIFACT_SUFFIX}')
+    with instrumentation.span('export.artifacts'):
+        gdf.to_parquet(file_path)
+        print("Saved", file_path)
+        if geojson_export:
+            gdf.to_file(filename=file_path.with_suffix(GEOJSON_SUFFIX), driver="GeoJSON")
+            print("Saved", file_path.with_suffix(GEOJSON_SUFFIX))
+    return file_path
+
+
+class GeoFrameAccumulator:
+    """
+    Collects GeoDataFrame parts (e.g. the results of all tile groups) and concatenates them once at the end, instead of
+    copying the growing frame with every part.
+    """
+
+    def __init__(self, crs=4326):
+        self.crs = crs
+        self.parts = []
+
+    def append(self, gdf: gpd.GeoDataFrame):
+        if gdf is not None and not gdf.empty:
+            self.parts.append(gdf)
+
+    def __len__(self):
+        """
+        Number of collected rows
+        """
+        return sum(len(part) for part in self.parts)
+
+    def to_geodataframe(self):
+        if len(self.parts) == 0:
+            return gpd.GeoDataFrame()
+        return gpd.GeoDataFrame(pandas.concat(self.parts, axis=0, ignore_index=True), crs=self.crs)
+
+    def write(self, file_name: str, kind: str, geojson_export: bool = False, folder: Path = ARTIFACT_FOLDER):
+        """
+        Concatenate all parts and save them as artifact, see write_artifact.
+        """
+        return write_artifact(self.to_geodataframe(), file_name, kind, geojson_export, folder)
+
+
+def newest_artifact(kind: str, folder: Path = ARTIFACT_FOLDER):
+    """
+    Latest artifact of the given kind in the folder. GeoJSON files count as well (results of older versions), if a
+    run wrote both formats the GeoParquet file is used.
+
+    :return: path of the file or None if there is none
+    """
+    files = [file_path for file_path in Path(folder).iterdir()
+             if file_path.suffix in (ARTIFACT_SUFFIX, GEOJSON_SUFFIX) and file_path.stem.endswith(f'_{kind}')]
+    if len(files) == 0:
+        return None
+    newest_file = max(files, key=os.path.getctime)
+    parquet_file = newest_file.with_suffix(ARTIFACT_SUFFIX)
+    return parquet_file if parquet_file.exists() else newest_file
+
+
+def read_artifact(file_path: Path, columns: list = None):
+    """
+    :param columns: only read these columns (the geometry column always gets read), None for all
+    """
+    file_path = Path(file_path)
+    if columns is not None and 'geometry' not in columns:
+        columns = list(columns) + ['geometry']
+
+    if file_path.suffix == ARTIFACT_SUFFIX:
+        return gpd.read_parquet(file_path, columns=columns)
+
+    gdf = gpd.read_file(filename=file_path)
+    return gdf if columns is None else gdf[columns]
+
+
+def read_newest_artifact(kind: str, columns: list = None, folder: Path = ARTIFACT_FOLDER):
+    """
+    :return: (GeoDataFrame, path) of the latest artifact of the given kind
+    """
+    file_path = newest_artifact(kind, folder)
+    if file_path is None:
+        raise FileNotFoundError(f'No {kind} file found in {folder}')
+    print(f'Loading {file_path}')
+    return read_artifact(file_path, columns), file_path
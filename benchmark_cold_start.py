@@ -0,0 +1,64 @@
+import sys
+import argparse
+import statistics
+import subprocess
+
+
+# modules every headless run (and every worker process) imports
+ENTRY_MODULES = ['grid_generation', 'darp', 'MultiRobotPathPlanner', 'get_darp_working', 'get_grid_and_paths',
+                 'plan_all_areas']
+# interactive, visualization and video dependencies which should only get imported on first use
+DISPLAY_MODULES = ['ipyleaflet', 'ipywidgets', 'IPython', 'pygame', 'sklearn', 'moviepy', 'matplotlib', 'imageio',
+                   'PIL', 'folium', 'Visualization', 'frame_writer', 'gridding_helpers']
+
+
+def measure_import(module_name: str):
+    """
+    Import the module in a fresh interpreter with -X importtime.
+
+    :return: (total import seconds, {module: self seconds}, list of loaded display modules)
+    """
+    code = f'import sys, {module_name}; print(",".join(m for m in {DISPLAY_MODULES!r} if m in sys.modules))'
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f'import of {module_name} failed:\n{result.stderr}')
+
+    self_times = {}
+    total_seconds = 0.0
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        self_times[name.strip()] = int(self_us) / 1e6
+        if name.strip() == module_name:
+            total_seconds = int(cumulative_us) / 1e6
+    loaded_display_modules = [m for m in result.stdout.strip().splitlines()[-1].split(',') if m] \
+        if result.stdout.strip() else []
+    return total_seconds, self_times, loaded_display_modules
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Cold start import time of the headless entry modules, every "
+                                                 "measurement in a fresh interpreter.")
+    parser.add_argument('modules', nargs='*', default=ENTRY_MODULES, help="modules to import")
+    parser.add_argument('--repeat', type=int, default=5, help="measurements per module, the median gets reported")
+    parser.add_argument('--top', type=int, default=5, help="show the slowest imported modules (self time)")
+    args = parser.parse_args()
+
+    # the first interpreter start fills the byte code (and numba) caches, it doesn't count
+    measure_import(args.modules[0])
+
+    heavy_imports_found = False
+    for module_name in args.modules:
+        measurements = [measure_import(module_name) for _ in range(args.repeat)]
+        median_seconds = statistics.median(total for total, _, _ in measurements)
+        _, self_times, loaded_display_modules = measurements[-1]
+
+        print(f'{module_name}: {median_seconds:.3f} sec (median of {args.repeat})')
+        for name, seconds in sorted(self_times.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+            print(f'    {seconds:.3f} sec  {name}')
+        if loaded_display_modules:
+            heavy_imports_found = True
+            print('    display modules imported:', ', '.join(loaded_display_modules))
+
+    sys.exit(1 if heavy_imports_found else 0)
@@ -0,0 +1,119 @@
+import numpy as np
+from turns import path_statistics
+
+
+def row_intervals(region: np.ndarray):
+    """
+    Column interval of every row of a region, if the region is row-convex.
+
+    :param region: bool array of the (subcell) region
+
+    :return: (rows, first columns, last columns) or None if the region rows are not consecutive or a row is no single
+    interval
+    """
+    rows = np.flatnonzero(region.any(axis=1))
+    if len(rows) == 0 or np.any(np.diff(rows) != 1):
+        return None
+
+    region_rows = region[rows]
+    first = region_rows.argmax(axis=1)
+    last = region.shape[1] - 1 - region_rows[:, ::-1].argmax(axis=1)
+    if np.any(np.count_nonzero(region_rows, axis=1) != last - first + 1):
+        return None
+    return rows, first, last
+
+
+def row_sweep(region: np.ndarray, start: tuple):
+    """
+    Boustrophedon sweep row by row over a row-convex region, starting at start.
+
+    The start has to be inside the first or the last two rows of the region (the first or last tile row on the subcell
+    grid), the sweep then runs from this side to the other one. Every row gets driven from its nearer end to the far
+    end. If the end of a row is outside of the next row, the drone drives back along the row before changing rows,
+    these transit moves visit cells a second time.
+
+    :param region: bool array of the (subcell) region
+
+    :param start: (row, column) of the start cell
+
+    :return: (N x 4) int32 array of moves (previous row, previous column, row, column) or None
+    """
+    intervals = row_intervals(region)
+    if intervals is None:
+        return None
+    rows, first, last = intervals
+
+    start_row, start_col = start
+    if start_row - rows[0] <= 1:
+        order = range(len(rows))
+    elif rows[-1] - start_row <= 1:
+        order = range(len(rows) - 1, -1, -1)
+    else:
+        return None
+
+    cells = [(start_row, start_col)]
+
+    def drive_to(row, col):
+        current_row, current_col = cells[-1]
+        row_step = 1 if row > current_row else -1
+        cells.extend((r, current_col) for r in range(current_row + row_step, row + row_step, row_step))
+        col_step = 1 if col > current_col else -1
+        cells.extend((row, c) for c in range(current_col + col_step, col + col_step, col_step))
+
+    for k in order:
+        row, a, b = rows[k], first[k], last[k]
+        current_row, current_col = cells[-1]
+        if not (a <= current_col <= b):
+            # drive along the current row until the next row is right next to it, then change the row
+            drive_to(current_row, min(max(current_col, a), b))
+        drive_to(row, cells[-1][1])
+
+        current_col = cells[-1][1]
+        if current_col - a <= b - current_col:
+            drive_to(row, a)
+            drive_to(row, b)
+        else:
+            drive_to(row, b)
+            drive_to(row, a)
+
+    cells = np.array(cells, dtype=np.int32)
+    return np.concatenate([cells[:-1], cells[1:]], axis=1)
+
+
+def boustrophedon_path(region: np.ndarray, start: tuple, max_transit_ratio: float = 0.1):
+    """
+    Lawn-mower path for a robot region which is convex in row or column direction, as alternative to MST + STC.
+
+    Only sweeps with the fewest lanes (rows or columns of the region) are tried, a sweep across the longer side of a
+    region needs more turns than STC. If both sides are equal, the sweep with fewer turns (then fewer moves) is used.
+
+    :param region: bool array of the (subcell) region
+
+    :param start: (row, column) of the start cell, has to be in the first or last tile row / column of the sweep
+
+    :param max_transit_ratio: maximum count of moves visiting a cell a second time relative to the region cell count
+
+    :return: (N x 4) int32 array of moves (previous row, previous column, row, column) or None if the region needs
+    STC
+    """
+    row_lanes = np.count_nonzero(region.any(axis=1))
+    col_lanes = np.count_nonzero(region.any(axis=0))
+
+    candidates = []
+    if row_lanes <= col_lanes:
+        path = row_sweep(region, start)
+        if path is not None:
+            candidates.append(path)
+    if col_lanes <= row_lanes:
+        path = row_sweep(region.T, (start[1], start[0]))
+        if path is not None:
+            candidates.append(path[:, [1, 0, 3, 2]])
+
+    region_cells = np.count_nonzero(region)
+    candidates = [path for path in candidates if len(path) - (region_cells - 1) <= max_transit_ratio * region_cells]
+    if len(candidates) == 0:
+        return None
+
+    statistics = path_statistics(candidates)
+    best = min(range(len(candidates)), key=lambda i: (statistics['turns'][i], statistics['length'][i]))
+    return candidates[best]
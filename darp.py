@@ -1,15 +1,15 @@
 import numpy as np
 import sys
 import cv2
-from Visualization import darp_area_visualization
 import time
 from tqdm.auto import tqdm
-import imageio
-from PIL import Image, ImageDraw, ImageFont
+from darp_trace import DARPTraceRecorder
+import instrumentation
 from pathlib import Path
 import os
+import heapq
 # from pyinstrument import Profiler
-from numba import njit
+from numba import njit, prange
 
 np.set_printoptions(threshold=sys.maxsize)
 float_overflow = np.finfo(np.float64).max / 10
@@ -85,12 +85,12 @@ def check_array_continuity(area: np.ndarray):
         return True
 
 
-@njit
+@njit("void(int64)", cache=True)
 def seed(a):
     np.random.seed(a)
 
 
-@njit(fastmath=True, cache=True)
+@njit("void(int64[:, :], int64[:, :], float64[:, :, :], float64[:])", fastmath=True, cache=True)
 def assign(non_obs_pos: np.ndarray,
            Assignment_Matrix: np.ndarray,
            Metric_Matrix: np.ndarray,
@@ -115,7 +115,7 @@ def assign(non_obs_pos: np.ndarray,
         ArrayOfElements[i] = np.count_nonzero(Assignment_Matrix == i) - 1  # -1 for the start position of robot i
 
 
-@njit(fastmath=True)
+@njit("void(int64[:, :], float64[:, :], float64[:, :], float64[:, :], float64)", fastmath=True, cache=True)
 def FinalUpdateOnMetricMatrix(non_obs_pos: np.ndarray,
                               criterionMatrix: np.ndarray,
                               MetricMatrix: np.ndarray,
@@ -131,7 +131,7 @@ def FinalUpdateOnMetricMatrix(non_obs_pos: np.ndarray,
         MetricMatrix[cell[0], cell[1]] *= ConnectedMultiplierMatrix[cell[0], cell[1]]
 
 
-@njit(fastmath=True)
+@njit("float32[:, :](int64[:, :], float64, float32[:, :], float32[:, :])", fastmath=True, cache=True)
 def calc_connected_multiplier(non_obs_pos: np.ndarray,
                               cc_variation: float,
                               dist1: np.ndarray,
@@ -161,31 +161,31 @@ def calc_connected_multiplier(non_obs_pos: np.ndarray,
     return returnM
 
 
-@njit(fastmath=True)
-def calculateCriterionMatrix(importance_trigger,
+@njit("void(float64[:, :], boolean, float64[:, :], float64, float64, float64, boolean)", fastmath=True, cache=True)
+def calculateCriterionMatrix(criterionMatrix,
+                             importance_trigger,
                              TilesImportanceMatrix,
                              MinimumImportance,
                              MaximumImportance,
                              correctionMult,
                              below_zero):
     """
-    Generates a new correction multiplier matrix.
-    If importance_trigger is True: ImportanceMatrix influence is considered.
+    Writes the new correction multiplier matrix into criterionMatrix.
+    If importance_trigger is True: ImportanceMatrix influence is considered, otherwise TilesImportanceMatrix is unused
+    and may be empty.
     """
-    returnCrit = np.zeros(TilesImportanceMatrix.shape)
     if importance_trigger:
         if below_zero:
-            returnCrit = (TilesImportanceMatrix - MinimumImportance) * (
+            criterionMatrix[:, :] = (TilesImportanceMatrix - MinimumImportance) * (
                     (correctionMult - 1) / (MaximumImportance - MinimumImportance)) + 1
         else:
-            returnCrit = (TilesImportanceMatrix - MinimumImportance) * (
+            criterionMatrix[:, :] = (TilesImportanceMatrix - MinimumImportance) * (
                     (1 - correctionMult) / (MaximumImportance - MinimumImportance)) + correctionMult
     else:
-        returnCrit[:, :] = correctionMult
-    return returnCrit
+        criterionMatrix[:, :] = correctionMult
 
 
-@njit(fastmath=True)  # parallel=True, fastmath=True
+@njit("UniTuple(uint8[:, :], 2)(int64[:, :], int32[:, :], int64[:])", fastmath=True, cache=True)  # parallel=True
 def construct_binary_images(non_obs_pos: np.ndarray,
                             area_tiles: np.ndarray,
                             robot_start_point: np.ndarray):
@@ -215,7 +215,7 @@ def construct_binary_images(non_obs_pos: np.ndarray,
     return robot_tiles_binary, nonrobot_tiles_binary
 
 
-@njit(fastmath=True)
+@njit("void(uint8[:, :, :], int64[:, :], int64[:, :])", fastmath=True, cache=True)
 def update_connectivity(connectivity_matrix: np.ndarray,
                         assignment_matrix: np.ndarray,
                         non_obs_pos: np.ndarray):
@@ -237,12 +237,12 @@ def update_connectivity(connectivity_matrix: np.ndarray,
                     connectivity_matrix[connectid, cell[0], cell[1]] = 0
 
 
-@njit(fastmath=True)
+@njit("uint8[:, :](uint8[:, :])", fastmath=True, cache=True)
 def inverse_binary_map_as_uint8(BinaryMap: np.ndarray):
     return np.logical_not(BinaryMap).astype(np.uint8)
 
 
-@njit(fastmath=True)
+@njit("void(boolean, float32[:, :])", fastmath=True, cache=True)
 def normalize_euclidian_distance(RobotR,
                                  distances_map):
     MaxV = np.amax(distances_map)
@@ -275,7 +275,7 @@ def NormalizedEuclideanDistanceBinary(RobotR: bool,
     return distances_map
 
 
-@njit(fastmath=True)
+@njit("float64(int64[:], int64[:])", fastmath=True, cache=True)
 def euclidian_distance_points2d(array1: np.array,
                                 array2: np.array) -> np.float_:
     return (
@@ -308,7 +308,7 @@ def normalize_metric_matrix(non_obs_pos: np.ndarray,
     return new_metric_matrix
 
 
-@njit(cache=True, fastmath=True)
+@njit("boolean(float64[:, :, :])", cache=True, fastmath=True)
 def check_for_near_float64_overflow(metric_matrix: np.ndarray):
     if np.amax(metric_matrix) > float_overflow:
         return True
@@ -316,10 +316,128 @@ def check_for_near_float64_overflow(metric_matrix: np.ndarray):
         return False
 
 
-@njit(cache=True, fastmath=True)
+@njit("float64[:, :, :](boolean[:, :], int64[:, :])", cache=True, parallel=True)
+def geodesic_distance_maps(area_bool: np.ndarray,
+                           initial_positions: np.ndarray):
+    """
+    Calculates the in-water (geodesic) shortest path distances from every start point to every tile of the area.
+
+    Dijkstra on the 8-neighbourhood of the tile grid: straight steps cost 1, diagonal steps cost sqrt(2) and are only
+    allowed if both adjacent straight neighbours are water too, so no path cuts across a land corner.
+
+    :param area_bool: Must be bool array. True entries are considered water tiles, the rest are obstacles.
+
+    :param initial_positions: start point (row, col) per robot
+
+    :return: distance maps in shape (len(initial_positions), rows, cols), obstacle tiles keep the value zero
+    """
+    rows, cols = area_bool.shape
+    distance_maps = np.zeros((len(initial_positions), rows, cols), dtype=np.float64)
+    neighbours_row = np.array([-1, 1, 0, 0, -1, -1, 1, 1])
+    neighbours_col = np.array([0, 0, -1, 1, -1, 1, -1, 1])
+    diagonal_cost = 2 ** 0.5
+
+    for idx in prange(len(initial_positions)):
+        distances = np.full((rows, cols), np.inf)
+        visited = np.zeros((rows, cols), dtype=np.bool_)
+        start_row, start_col = initial_positions[idx][0], initial_positions[idx][1]
+        distances[start_row, start_col] = 0.0
+        heap = [(0.0, start_row * cols + start_col)]
+
+        while len(heap) > 0:
+            dist, flat_idx = heapq.heappop(heap)
+            row = flat_idx // cols
+            col = flat_idx % cols
+            if visited[row, col]:
+                continue
+            visited[row, col] = True
+
+            for n in range(8):
+                n_row = row + neighbours_row[n]
+                n_col = col + neighbours_col[n]
+                if not (0 <= n_row < rows and 0 <= n_col < cols) or not area_bool[n_row, n_col] \
+                        or visited[n_row, n_col]:
+                    continue
+                if n < 4:
+                    step = 1.0
+                else:
+                    # diagonal step only between two water tiles
+                    if not area_bool[row, n_col] or not area_bool[n_row, col]:
+                        continue
+                    step = diagonal_cost
+                if dist + step < distances[n_row, n_col]:
+                    distances[n_row, n_col] = dist + step
+                    heapq.heappush(heap, (dist + step, n_row * cols + n_col))
+
+        for row in range(rows):
+            for col in range(cols):
+                if visited[row, col]:
+                    distance_maps[idx, row, col] = distances[row, col]
+
+    return distance_maps
+
+
+@njit("float64[:, :, :](int64[:, :], int64[:, :], int64, int64)", cache=True, fastmath=True, parallel=True)
+def euclidian_distance_maps(non_obs_pos: np.ndarray,
+                            initial_positions: np.ndarray,
+                            rows: int,
+                            cols: int):
+    """
+    Calculates the euclidean distances from every start point to every non obstacle tile, parallel over the tiles.
+
+    :return: distance maps in shape (len(initial_positions), rows, cols), obstacle tiles keep the value zero
+    """
+    metrics_array = np.zeros((len(initial_positions), rows, cols), dtype=np.float_)
+    for c in prange(len(non_obs_pos)):
+        for idx in range(len(initial_positions)):
+            metrics_array[idx, non_obs_pos[c, 0], non_obs_pos[c, 1]] = euclidian_distance_points2d(
+                initial_positions[idx], non_obs_pos[c])
+    return metrics_array
+
+
+@njit("(int64[:, :], float64[:, :, :])", cache=True, fastmath=True, parallel=True)
+def tiles_importance(non_obs_pos: np.ndarray,
+                     metrics_array: np.ndarray):
+    """
+    Calculates the importance of every non obstacle tile per robot and its minimum and maximum per robot.
+    Tiles are processed in parallel first, the min/max reduction runs in parallel over the robots afterwards.
+
+    :return: importance_array in metrics_array.shape, min_importance, max_importance
+    """
+    robots = len(metrics_array)
+    importance_array = np.zeros(metrics_array.shape, dtype=np.float_)
+    max_importance = np.zeros(robots, dtype=np.float_)
+    min_importance = np.full(robots, np.finfo(np.float64).max)
+
+    for c in prange(len(non_obs_pos)):
+        row, col = non_obs_pos[c, 0], non_obs_pos[c, 1]
+        tempSum = 0.0
+        for idx in range(robots):
+            tempSum += metrics_array[idx, row, col]
+
+        for idx in range(robots):
+            if tempSum - metrics_array[idx, row, col] != 0:
+                importance_array[idx, row, col] = 1 / (tempSum - metrics_array[idx, row, col])
+            else:
+                importance_array[idx, row, col] = 1
+
+    for idx in prange(robots):
+        for c in range(len(non_obs_pos)):
+            value = importance_array[idx, non_obs_pos[c, 0], non_obs_pos[c, 1]]
+            if value > max_importance[idx]:
+                max_importance[idx] = value
+            if value < min_importance[idx]:
+                min_importance[idx] = value
+
+    return importance_array, min_importance, max_importance
+
+
+@njit("(boolean[:, :], int64[:, :], float64[:], boolean, boolean)", cache=True, fastmath=True)
 def construct_assignment_matrix(area_bool: np.ndarray,
                                 initial_positions: np.ndarray,
-                                desireable_tile_assignment: np.ndarray):
+                                desireable_tile_assignment: np.ndarray,
+                                geodesic: bool,
+                                importance: bool):
     rows, cols = area_bool.shape
     notiles = rows * cols
 
@@ -349,33 +467,24 @@ def construct_assignment_matrix(area_bool: np.ndarray,
     else:
         term_thr = 0
 
-    metrics_array = np.zeros((len(initial_positions), rows, cols), dtype=np.float_)
-    importance_array = np.zeros((len(initial_positions), rows, cols), dtype=np.float_)
-    max_importance = np.zeros(len(initial_positions), dtype=np.float_)
-    min_importance = np.full(len(initial_positions), np.finfo(np.float64).max)
-
-    for cell in non_obstacle_positions:
-        tempSum = 0
-        for idx in range(len(initial_positions)):
-            metrics_array[idx, cell[0], cell[1]] = euclidian_distance_points2d(initial_positions[idx], cell)
-            tempSum += metrics_array[idx, cell[0], cell[1]]
-
-        for idx in range(len(initial_positions)):
-            if tempSum - metrics_array[idx, cell[0], cell[1]] != 0:
-                importance_array[idx, cell[0], cell[1]] = 1 / (tempSum - metrics_array[idx, cell[0], cell[1]])
-            else:
-                importance_array[idx, cell[0], cell[1]] = 1
-
-            if importance_array[idx, cell[0], cell[1]] > max_importance[idx]:
-                max_importance[idx] = importance_array[idx, cell[0], cell[1]]
+    if geodesic:
+        # in-lake shortest path distances, tiles on the other side of land get no straight line shortcut
+        metrics_array = geodesic_distance_maps(area_bool, initial_positions)
+    else:
+        metrics_array = euclidian_distance_maps(non_obstacle_positions, initial_positions, rows, cols)
 
-            if importance_array[idx, cell[0], cell[1]] < min_importance[idx]:
-                min_importance[idx] = importance_array[idx, cell[0], cell[1]]
+    if importance:
+        importance_array, min_importance, max_importance = tiles_importance(non_obstacle_positions, metrics_array)
+    else:
+        # importance arrays are never read without importance trigger, keep them empty
+        importance_array = np.zeros((len(initial_positions), 0, 0), dtype=np.float_)
+        max_importance = np.zeros(len(initial_positions), dtype=np.float_)
+        min_importance = np.zeros(len(initial_positions), dtype=np.float_)
 
     return metrics_array, non_obstacle_positions, term_thr, notiles, initial_positions, desireable_tile_assignment, importance_array, min_importance, max_importance, effective_size
 
 
-@njit(cache=True, fastmath=True)
+@njit("void(boolean[:, :, :], int64[:, :], int64[:, :])", cache=True, fastmath=True)
 def getBinaryRobotRegions(binary_robot_regions: np.ndarray,
                           non_obs_pos: np.ndarray,
                           final_assignment_matrix: np.ndarray):
@@ -389,7 +498,7 @@ def getBinaryRobotRegions(binary_robot_regions: np.ndarray,
                 binary_robot_regions[i, cell[0], cell[1]] = True
 
 
-@njit(fastmath=True)
+@njit("boolean(int64, boolean[:], float64[:], float64[:])", fastmath=True, cache=True)
 def check_assignment_state(thresh: int,
                            connected_robot_regions: np.ndarray,
                            desirable_tile_assignment: np.ndarray,
@@ -412,7 +521,9 @@ def check_assignment_state(thresh: int,
 class DARP:
     def __init__(self, area_bool: np.ndarray, max_iter: np.uint32, cc_variation: float, random_level: float,
                  dynamic_cells: np.uint32, dict_darp_startparameter: dict, seed_value, importance: bool,
-                 visualization: bool, video_export: bool, import_file_name: str):
+                 visualization: bool, video_export: bool, import_file_name: str, geodesic_metric: bool = False,
+                 video_frame_stride: int = 5, video_downscale: int = 1, video_max_frames: int = None,
+                 trace_export: bool = False):
 
         print("Tile group to process: " + import_file_name)
         print("Grid Dimensions: ", str(area_bool.shape))
@@ -423,6 +534,7 @@ class DARP:
         print("Importance: " + str(importance))
         print("ConnectedMultiplierMatrix Variation: " + str(cc_variation))
         print("Random Influence Number: " + str(random_level))
+        print("Geodesic Metric: " + str(geodesic_metric))
 
         # start performance analyse
         # profiler = Profiler()
@@ -449,6 +561,7 @@ class DARP:
         self.rows, self.cols = area_bool.shape
         self.visualization = visualization  # should the results get presented in pygame
         self.video_export = video_export  # should steps of changes in the assignment matrix get written down
+        self.trace_export = trace_export  # should every change of the assignment matrix get recorded as delta trace
         self.MaxIter = max_iter
         self.ConnectedMultiplier_variation = cc_variation
         self.randomLevel = random_level
@@ -456,10 +569,14 @@ class DARP:
         self.Importance = importance
         self.import_file_name = import_file_name
         self.GridEnv_bool = area_bool
+        self.GeodesicMetric = geodesic_metric  # initial metric as in-lake shortest path instead of euclidean distance
 
         measure_start = time.time()
-        self.MetricMatrix, self.non_obstacle_positions, self.termThr, self.Notiles, self.init_robot_pos, self.DesirableAssign, self.TilesImportance, self.MinimumImportance, self.MaximumImportance, self.effectiveTileNumber = construct_assignment_matrix(
-            self.GridEnv_bool, np.asarray(self.init_robot_pos), self.DesirableAssign)
+        with instrumentation.span('darp.assignment_matrix'):
+            self.MetricMatrix, self.non_obstacle_positions, self.termThr, self.Notiles, self.init_robot_pos, self.DesirableAssign, self.TilesImportance, self.MinimumImportance, self.MaximumImportance, self.effectiveTileNumber = construct_assignment_matrix(
+                self.GridEnv_bool, np.asarray(self.init_robot_pos, dtype=np.int64), self.DesirableAssign,
+                self.GeodesicMetric,
+                self.Importance)
         measure_end = time.time()
         print("Measured time construct_assignment_matrix(): ", (measure_end - measure_start), " sec")
         if len(dict_darp_startparameter) > len(self.DesirableAssign):
@@ -467,7 +584,8 @@ class DARP:
 
         print("Effective number of tiles after start parameter check and balancing:", str(self.effectiveTileNumber))
 
-        self.A = np.full((self.rows, self.cols), len(self.init_robot_pos))
+        # explicit dtype, the precompiled numba kernels only accept int64 assignment matrices on every platform
+        self.A = np.full((self.rows, self.cols), len(self.init_robot_pos), dtype=np.int64)
         self.connectivity = np.zeros((len(self.init_robot_pos), self.rows, self.cols), dtype=np.uint8)
         self.BinaryRobotRegions = np.full((len(self.init_robot_pos), self.rows, self.cols), False, dtype=bool)
         self.ArrayOfElements = np.zeros(len(self.init_robot_pos))
@@ -483,7 +601,9 @@ class DARP:
         # profiler.open_in_browser()
         ##########################
 
+        # visualization (pygame) and video (imageio, PIL) modules only get imported when they are used
         if self.visualization:
+            from Visualization import darp_area_visualization
             self.assignment_matrix_visualization = darp_area_visualization(self.A, len(self.init_robot_pos),
                                                                            self.color, self.init_robot_pos)
 
@@ -491,7 +611,10 @@ class DARP:
             movie_file_path = Path("result_export", self.import_file_name + ".gif")
             if not movie_file_path.parent.exists():
                 os.makedirs(movie_file_path.parent)
-            self.gif_writer = imageio.get_writer(movie_file_path, mode='I', duration=0.15)
+            # frames get encoded in a background thread, the DARP loop only hands over a copy of self.A
+            from frame_writer import BackgroundFrameWriter
+            self.frame_writer = BackgroundFrameWriter(movie_file_path, frame_stride=video_frame_stride,
+                                                      downscale=video_downscale, max_frames=video_max_frames)
 
         if seed_value is None:
             self.seed_value = None
@@ -514,9 +637,7 @@ class DARP:
 
         if not len(self.init_robot_pos) > 1:
             success = True
-            # no self.gif_writer created if not len(self.init_robot_pos) > 1
-            # if self.video_export:
-            #     self.gif_writer.close()
+            # no self.frame_writer created if not len(self.init_robot_pos) > 1
             print("Initial drone / startpoint count is only 1. Skip DARP.")
 
         else:
@@ -537,12 +658,19 @@ class DARP:
             if self.video_export:
                 self.video_export_add_frame(absolut_iterations, self.ConnectedRobotRegions)
 
+            if self.trace_export:
+                trace_recorder = DARPTraceRecorder(Path("result_export", self.import_file_name + "_darp_trace.npz"),
+                                                   self.A, self.DesirableAssign, self.init_robot_pos)
+
             if self.visualization:
                 self.assignment_matrix_visualization.placeCells(self.A)
 
             print("Desirable Assignments:", self.DesirableAssign, ", Tiles per Robot:", self.ArrayOfElements,
                   "\nTermination threshold: max", self.termThr, "tiles difference per robot to desirable value.")
 
+            # comparing the assignment matrix before and after every assign costs a copy, only done for run reports
+            count_reassigned_cells = instrumentation.enabled()
+
             while self.termThr <= self.Dynamic_Cells and not success:
                 downThres = (self.Notiles - self.termThr * (len(self.init_robot_pos) - 1)) / (
                         self.Notiles * len(self.init_robot_pos))
@@ -560,33 +688,39 @@ class DARP:
                     plainErrors = np.zeros((len(self.init_robot_pos)))
                     divFairError = np.zeros((len(self.init_robot_pos)))
 
-                    update_connectivity(self.connectivity, self.A, self.non_obstacle_positions)
-                    for idx, robot in enumerate(self.init_robot_pos):
-                        ConnectedMultiplier = np.ones((self.rows, self.cols))
-                        self.ConnectedRobotRegions[idx] = True
-                        num_labels, labels_im = cv2.connectedComponents(self.connectivity[idx, :, :], connectivity=4)
-                        if num_labels > 2:
-                            self.ConnectedRobotRegions[idx] = False
-                            BinaryRobot, BinaryNonRobot = construct_binary_images(self.non_obstacle_positions,
-                                                                                  labels_im,
-                                                                                  robot)
-                            ConnectedMultiplier = calc_connected_multiplier(self.non_obstacle_positions,
-                                                                            self.ConnectedMultiplier_variation,
-                                                                            NormalizedEuclideanDistanceBinary(True,
-                                                                                                              BinaryRobot),
-                                                                            NormalizedEuclideanDistanceBinary(False,
-                                                                                                              BinaryNonRobot))
-                        ConnectedMultiplierArrays[idx, :, :] = ConnectedMultiplier
-                        plainErrors[idx] = self.ArrayOfElements[idx] / (
-                                self.DesirableAssign[idx] * len(self.init_robot_pos))
-                        if plainErrors[idx] < downThres:
-                            divFairError[idx] = downThres - plainErrors[idx]
-                        elif plainErrors[idx] > upperThres:
-                            divFairError[idx] = upperThres - plainErrors[idx]
+                    with instrumentation.span('darp.connectivity_repair'):
+                        update_connectivity(self.connectivity, self.A, self.non_obstacle_positions)
+                        for idx, robot in enumerate(self.init_robot_pos):
+                            ConnectedMultiplier = np.ones((self.rows, self.cols))
+                            self.ConnectedRobotRegions[idx] = True
+                            num_labels, labels_im = cv2.connectedComponents(self.connectivity[idx, :, :],
+                                                                            connectivity=4)
+                            if num_labels > 2:
+                                self.ConnectedRobotRegions[idx] = False
+                                instrumentation.count('darp.disconnected_regions')
+                                BinaryRobot, BinaryNonRobot = construct_binary_images(self.non_obstacle_positions,
+                                                                                      labels_im,
+                                                                                      robot)
+                                ConnectedMultiplier = calc_connected_multiplier(
+                                    self.non_obstacle_positions,
+                                    self.ConnectedMultiplier_variation,
+                                    NormalizedEuclideanDistanceBinary(True, BinaryRobot),
+                                    NormalizedEuclideanDistanceBinary(False, BinaryNonRobot))
+                            ConnectedMultiplierArrays[idx, :, :] = ConnectedMultiplier
+                            plainErrors[idx] = self.ArrayOfElements[idx] / (
+                                    self.DesirableAssign[idx] * len(self.init_robot_pos))
+                            if plainErrors[idx] < downThres:
+                                divFairError[idx] = downThres - plainErrors[idx]
+                            elif plainErrors[idx] > upperThres:
+                                divFairError[idx] = upperThres - plainErrors[idx]
 
                     if self.video_export:
                         self.video_export_add_frame(absolut_iterations, self.ConnectedRobotRegions)
 
+                    if self.trace_export:
+                        trace_recorder.record(absolut_iterations, self.A, self.ArrayOfElements,
+                                              self.ConnectedRobotRegions, plainErrors, divFairError)
+
                     if self.visualization:
                         self.assignment_matrix_visualization.placeCells(self.A, iteration_number=absolut_iterations)
                         # time.sleep(0.1)
@@ -596,8 +730,6 @@ class DARP:
                                               self.DesirableAssign, self.ArrayOfElements):
                         time_stop = time.time()
                         success = True
-                        if self.video_export:
-                            self.gif_writer.close()
                         if (time_stop - time_start) > 0:
                             print("Found Final Assignment Matrix:",
                                   absolut_iterations, "Iterations in", (time_stop - time_start),
@@ -637,12 +769,13 @@ class DARP:
                             else:
                                 correctionMult[idx] = 1 - (plainErrors[idx] / totalNegPlainErrors) * (TotalNegPerc / 2)
 
-                            criterionMatrix = calculateCriterionMatrix(self.Importance,
-                                                                       self.TilesImportance[idx],
-                                                                       self.MinimumImportance[idx],
-                                                                       self.MaximumImportance[idx],
-                                                                       correctionMult[idx],
-                                                                       divFairError[idx] < 0)
+                            calculateCriterionMatrix(criterionMatrix,
+                                                     self.Importance,
+                                                     self.TilesImportance[idx],
+                                                     self.MinimumImportance[idx],
+                                                     self.MaximumImportance[idx],
+                                                     correctionMult[idx],
+                                                     divFairError[idx] < 0)
 
                         FinalUpdateOnMetricMatrix(
                             self.non_obstacle_positions,
@@ -651,7 +784,11 @@ class DARP:
                             ConnectedMultiplierArrays[idx, :, :],
                             self.randomLevel)
 
+                    if count_reassigned_cells:
+                        previous_A = self.A.copy()
                     assign(self.non_obstacle_positions, self.A, self.MetricMatrix, self.ArrayOfElements)
+                    if count_reassigned_cells:
+                        instrumentation.count('darp.cells_reassigned', int(np.count_nonzero(self.A != previous_A)))
 
                     absolut_iterations += 1
 
@@ -668,19 +805,27 @@ class DARP:
                     self.termThr += 10
                     print("\nIncreasing termination threshold to", self.termThr, "\n")
 
+            if self.video_export:
+                # wait for the background writer to encode the remaining frames
+                self.frame_writer.close()
+
+            if self.trace_export:
+                trace_recorder.save()
+
+        instrumentation.count('darp.iterations', absolut_iterations)
         getBinaryRobotRegions(self.BinaryRobotRegions, self.non_obstacle_positions, self.A)
         return success, absolut_iterations
 
     def video_export_add_frame(self, iteration: int,
                                connected_regions: np.ndarray,
                                draw_meta_infos=False):
-        framerate = 5  # every 5th iteration
-
-        if (iteration % framerate) == 0 or iteration == 0:
-            uint8_array = np.uint8(np.interp(self.A, (self.A.min(), self.A.max()), (0, 255)))  # TODO interpolate or scale?
-            temp_img = Image.fromarray(uint8_array)  # mode="RGB"
-            if draw_meta_infos:  # if drawn pictures are big enough: set True to view darp metadata in gif
-                font = ImageFont.truetype("arial.ttf", 9)
-                txt = f'{time.strftime("%H:%M:%S %d.%m.%Y")}\nInitial positions:\n{str(self.init_robot_pos)}\nSeed: {str(self.seed_value)}\nRandom Influence: {self.randomLevel}\nCriterion Matrix Variation: {self.ConnectedMultiplier_variation}\nImportance: {self.Importance}\nDesired Assignment:\n{str(self.DesirableAssign)}\nAssignment per Robot:\n{str(self.ArrayOfElements)}\nTiles Connected:\n{str(connected_regions)}\nIteration: {iteration}'
-                ImageDraw.Draw(temp_img).multiline_text((3, 3), txt, spacing=2, font=font)
-            self.gif_writer.append_data(np.asarray(temp_img))
+        if not self.frame_writer.wants_frame(iteration):
+            return
+
+        meta_text = None
+        if draw_meta_infos:  # if drawn pictures are big enough: set True to view darp metadata in gif
+            from frame_writer import darp_meta_text
+            meta_text = darp_meta_text(iteration, self.init_robot_pos, self.seed_value, self.randomLevel,
+                                       self.ConnectedMultiplier_variation, self.Importance, self.DesirableAssign,
+                                       self.ArrayOfElements, connected_regions)
+        self.frame_writer.add_frame(iteration, self.A, meta_text)
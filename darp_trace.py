@@ -0,0 +1,164 @@
+import sys
+import argparse
+from pathlib import Path
+import os
+import numpy as np
+
+
+class DARPTraceRecorder:
+    """
+    Records how the DARP assignment matrix evolves for post-hoc analysis.
+
+    Only the initial assignment matrix is stored completely. Every recorded iteration afterwards stores the
+    (flat cell index, new owner) pairs of the cells which changed since the last record together with
+    ArrayOfElements, ConnectedRobotRegions and the fairness errors of that iteration.
+    The trace is written once as compressed .npz file, use DARPTrace to replay it.
+    """
+
+    def __init__(self, file_path, initial_assignment: np.ndarray, desirable_assign: np.ndarray,
+                 init_robot_pos: np.ndarray):
+        self.file_path = Path(file_path)
+        self.initial_assignment = initial_assignment.copy()
+        self.last_assignment = initial_assignment.ravel().copy()
+        self.desirable_assign = np.array(desirable_assign, dtype=np.float64)
+        self.init_robot_pos = np.array(init_robot_pos, dtype=np.int32)
+
+        self.iterations = []
+        self.changed_cells = []
+        self.new_owners = []
+        self.array_of_elements = []
+        self.connected_robot_regions = []
+        self.plain_errors = []
+        self.div_fair_errors = []
+
+    def record(self, iteration: int, assignment_matrix: np.ndarray, array_of_elements: np.ndarray,
+               connected_robot_regions: np.ndarray, plain_errors: np.ndarray, div_fair_errors: np.ndarray):
+        flat_assignment = assignment_matrix.ravel()
+        changed = np.flatnonzero(flat_assignment != self.last_assignment)
+        self.last_assignment[changed] = flat_assignment[changed]
+
+        self.iterations.append(iteration)
+        self.changed_cells.append(changed.astype(np.int32))
+        self.new_owners.append(flat_assignment[changed].astype(np.int16))
+        self.array_of_elements.append(np.array(array_of_elements, dtype=np.int32))
+        self.connected_robot_regions.append(np.array(connected_robot_regions, dtype=bool))
+        self.plain_errors.append(np.array(plain_errors, dtype=np.float32))
+        self.div_fair_errors.append(np.array(div_fair_errors, dtype=np.float32))
+
+    def save(self):
+        if not self.file_path.parent.exists():
+            os.makedirs(self.file_path.parent)
+
+        robots = len(self.desirable_assign)
+        change_offsets = np.zeros(len(self.changed_cells) + 1, dtype=np.int64)
+        change_offsets[1:] = np.cumsum([len(c) for c in self.changed_cells])
+
+        np.savez_compressed(self.file_path,
+                            initial_assignment=self.initial_assignment,
+                            desirable_assign=self.desirable_assign,
+                            init_robot_pos=self.init_robot_pos,
+                            iterations=np.array(self.iterations, dtype=np.int32),
+                            change_offsets=change_offsets,
+                            changed_cells=np.concatenate(self.changed_cells or [np.zeros(0, dtype=np.int32)]),
+                            new_owners=np.concatenate(self.new_owners or [np.zeros(0, dtype=np.int16)]),
+                            array_of_elements=np.array(self.array_of_elements, dtype=np.int32).reshape(-1, robots),
+                            connected_robot_regions=np.array(self.connected_robot_regions,
+                                                             dtype=bool).reshape(-1, robots),
+                            plain_errors=np.array(self.plain_errors, dtype=np.float32).reshape(-1, robots),
+                            div_fair_errors=np.array(self.div_fair_errors, dtype=np.float32).reshape(-1, robots))
+        print("Saved DARP iteration trace with", len(self.iterations), "records and", change_offsets[-1],
+              "cell changes to", str(self.file_path))
+
+
+class DARPTrace:
+    """
+    Replays a trace written by DARPTraceRecorder.
+    """
+
+    def __init__(self, file_path):
+        with np.load(file_path) as data:
+            self.initial_assignment = data['initial_assignment']
+            self.desirable_assign = data['desirable_assign']
+            self.init_robot_pos = data['init_robot_pos']
+            self.iterations = data['iterations']
+            self.change_offsets = data['change_offsets']
+            self.changed_cells = data['changed_cells']
+            self.new_owners = data['new_owners']
+            self.array_of_elements = data['array_of_elements']
+            self.connected_robot_regions = data['connected_robot_regions']
+            self.plain_errors = data['plain_errors']
+            self.div_fair_errors = data['div_fair_errors']
+
+    def __len__(self):
+        """
+        Number of recorded frames
+        """
+        return len(self.iterations)
+
+    def frame(self, record_idx: int):
+        """
+        Reconstruct the assignment matrix of one recorded frame by applying all changes up to this record.
+
+        :param record_idx: index of the record (not the DARP iteration number), negative values count from the end
+
+        :return: assignment matrix in the shape of the initial assignment matrix
+        """
+        if record_idx < 0:
+            record_idx += len(self)
+        flat_assignment = self.initial_assignment.ravel().copy()
+        for i in range(record_idx + 1):
+            start, end = self.change_offsets[i], self.change_offsets[i + 1]
+            flat_assignment[self.changed_cells[start:end]] = self.new_owners[start:end]
+        return flat_assignment.reshape(self.initial_assignment.shape)
+
+    def frames(self):
+        """
+        Generator over all recorded frames, applies every change only once.
+        """
+        flat_assignment = self.initial_assignment.ravel().copy()
+        for i in range(len(self)):
+            start, end = self.change_offsets[i], self.change_offsets[i + 1]
+            flat_assignment[self.changed_cells[start:end]] = self.new_owners[start:end]
+            yield flat_assignment.reshape(self.initial_assignment.shape)
+
+    def summary(self, record_idx: int):
+        if record_idx < 0:
+            record_idx += len(self)
+        return (f'Iteration: {self.iterations[record_idx]}\n'
+                f'Desirable Assignments: {self.desirable_assign}\n'
+                f'Tiles per Robot: {self.array_of_elements[record_idx]}\n'
+                f'Connected: {self.connected_robot_regions[record_idx]}\n'
+                f'Plain Errors: {self.plain_errors[record_idx]}\n'
+                f'Fairness Errors: {self.div_fair_errors[record_idx]}\n'
+                f'Changed Cells: {self.change_offsets[record_idx + 1] - self.change_offsets[record_idx]}')
+
+
+def render_frame(assignment_matrix: np.ndarray, file_path):
+    import matplotlib.pyplot as plt
+
+    file_path = Path(file_path)
+    if not file_path.parent.exists():
+        os.makedirs(file_path.parent)
+    plt.imsave(file_path, assignment_matrix, dpi=100)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Replay a DARP iteration trace (.npz) offline.")
+    parser.add_argument('trace_file', help="trace file written by DARP with trigger_darp_trace_export")
+    parser.add_argument('--frame', type=int, default=None,
+                        help="record index to render (negative counts from the end), all records if not set")
+    parser.add_argument('--output', default='result_export', help="folder for the rendered images")
+    args = parser.parse_args()
+
+    trace = DARPTrace(args.trace_file)
+    trace_name = Path(args.trace_file).stem
+    print("Loaded trace with", len(trace), "records")
+
+    if args.frame is not None:
+        print(trace.summary(args.frame))
+        render_frame(trace.frame(args.frame), Path(args.output, f'{trace_name}_{args.frame}.png'))
+    else:
+        for idx, frame in enumerate(trace.frames()):
+            render_frame(frame, Path(args.output, f'{trace_name}_{idx:06d}.png'))
+
+    sys.exit(0)
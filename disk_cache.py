@@ -0,0 +1,128 @@
+import os
+import pickle
+import hashlib
+import tempfile
+
+
+class DiskCache:
+    """
+    Local on-disk cache of pickled results, addressed by a hash of their inputs (see make_key).
+
+    Every entry is one file in the cache directory. Reading an entry refreshes its modification time, if the cache
+    grows over max_size_bytes the least recently used entries get removed first.
+    """
+
+    def __init__(self, directory: str, max_size_bytes: int = None):
+        """
+        :param directory: cache folder, gets created if missing
+
+        :param max_size_bytes: size limit of all entries together, None for no limit
+        """
+        self.directory = directory
+        self.max_size_bytes = max_size_bytes
+        os.makedirs(self.directory, exist_ok=True)
+
+    @staticmethod
+    def make_key(*parts):
+        """
+        Hash of the given parts, bytes are hashed as they are and everything else by its repr.
+        """
+        sha = hashlib.sha256()
+        for part in parts:
+            part_bytes = part if isinstance(part, bytes) else repr(part).encode()
+            # length prefix keeps ('ab', 'c') and ('a', 'bc') apart
+            sha.update(len(part_bytes).to_bytes(8, 'little'))
+            sha.update(part_bytes)
+        return sha.hexdigest()
+
+    def __entry_path(self, key: str):
+        return os.path.join(self.directory, f'{key}.pkl')
+
+    def __contains__(self, key: str):
+        return os.path.isfile(self.__entry_path(key))
+
+    def load(self, key: str, default=None):
+        """
+        :return: cached object of key or default if there is none (or it is unreadable)
+        """
+        entry_path = self.__entry_path(key)
+        try:
+            with open(entry_path, 'rb') as f:
+                value = pickle.load(f)
+        except FileNotFoundError:
+            return default
+        except (pickle.UnpicklingError, EOFError, AttributeError, ImportError, ValueError):
+            print("Removing unreadable cache entry", entry_path)
+            self.invalidate(key)
+            return default
+
+        try:
+            os.utime(entry_path)
+        except OSError:
+            pass
+        return value
+
+    def store(self, key: str, value):
+        # write to a temporary file first, so parallel processes never read a half written entry
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.__entry_path(key))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self.__evict()
+
+    def invalidate(self, key: str):
+        try:
+            os.remove(self.__entry_path(key))
+        except FileNotFoundError:
+            pass
+
+    def clear(self):
+        for entry in self.__entries():
+            self.invalidate(entry[0])
+
+    def size(self):
+        return sum(entry_size for _, _, entry_size in self.__entries())
+
+    def __entries(self):
+        """
+        :return: list of (key, modification time, size in bytes) of all entries
+        """
+        entries = []
+        with os.scandir(self.directory) as it:
+            for dir_entry in it:
+                if dir_entry.is_file() and dir_entry.name.endswith('.pkl'):
+                    try:
+                        stat = dir_entry.stat()
+                    except FileNotFoundError:
+                        continue  # removed by another process
+                    entries.append((dir_entry.name[:-len('.pkl')], stat.st_mtime, stat.st_size))
+        return entries
+
+    def __evict(self):
+        if self.max_size_bytes is None:
+            return
+        entries = self.__entries()
+        total_size = sum(entry_size for _, _, entry_size in entries)
+        # least recently used first
+        for key, _, entry_size in sorted(entries, key=lambda entry: entry[1]):
+            if total_size <= self.max_size_bytes:
+                break
+            self.invalidate(key)
+            total_size -= entry_size
+
+
+def cache_from_settings(settings: dict, name: str):
+    """
+    Cache ./cache/<name> as configured by the settings <name>_cache (on / off) and <name>_cache_max_size_mb.
+
+    :return: DiskCache or None if it is switched off
+    """
+    if not settings.get(f'{name}_cache', False):
+        return None
+    max_size_mb = settings.get(f'{name}_cache_max_size_mb')
+    return DiskCache(os.path.join('.', 'cache', name), None if max_size_mb is None else int(max_size_mb * 2 ** 20))
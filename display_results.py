@@ -1,30 +1,20 @@
 import sys
-from pathlib import Path
 import os
-import geopandas as gpd
 import webbrowser
 from setting_helpers import load_yaml_config_file
+from artifact_io import read_newest_artifact
 import folium
 
 
-def search_newest_file_in_folder(path_to_folder, unique_search_string):
-    search_pattern = [unique_search_string]
-    files_in_folder = os.listdir(Path(path_to_folder).resolve())
-    files = [Path(path_to_folder, nm).resolve() for ps in search_pattern for nm in files_in_folder if ps in nm]
-    last_file_with_suffix = max(files, key=os.path.getctime)
-    return Path(last_file_with_suffix).name.removesuffix('.geojson')
-
-
 if __name__ == '__main__':
     # load settings first
     settings = load_yaml_config_file('./settings/settings_talsperre_malter.yaml')
 
-    # load last generated files
-    path_per_tilegroup_file = search_newest_file_in_folder(Path('geodataframes'), 'path_per_tilegroup')
-    paths_gdf = gpd.read_file(filename=f'./geodataframes/{path_per_tilegroup_file}.geojson')
-
-    subcells_and_lines_collection_file = search_newest_file_in_folder(Path('geodataframes'), 'subcells_and_lines_collection')
-    subcells_and_lines_collection_gdf = gpd.read_file(filename=f'./geodataframes/{subcells_and_lines_collection_file}.geojson')
+    # load last generated files, only the columns which get drawn
+    paths_gdf, _ = read_newest_artifact('path_per_tilegroup', ['tiles_group_identifier', 'assigned_startpoint',
+                                                               'path_length_meter'])
+    subcells_and_lines_collection_gdf, _ = read_newest_artifact('subcells_and_lines_collection',
+                                                                ['tiles_group_identifier'])
 
     # set geometry for drawing
     paths_gdf.set_geometry('geometry').set_crs(crs=4326)
@@ -47,8 +37,8 @@ if __name__ == '__main__':
     webbrowser.open(path)
 
     # save grid_gdf map as html and draw in browser
-    grid_file = search_newest_file_in_folder(Path('geodataframes'), 'grid')
-    grid_gdf = gpd.read_file(filename=f'./geodataframes/{grid_file}.geojson')
+    grid_gdf, grid_file_path = read_newest_artifact('grid', ['covered_area'])
+    grid_file = grid_file_path.stem
     fol_map = grid_gdf.explore('covered_area', cmap='Spectral')  # YlGn,jet, PuBu, legend=True, scheme='quantiles'
     for sp in settings['real_start_points']:
         folium.Marker([sp[1], sp[0]], popup="<i>Startpoint</i>").add_to(fol_map)
@@ -7,6 +7,7 @@ import geopandas as gpd
 # import matplotlib.pyplot as plt
 # from functools import partial
 from pathlib import Path
+from area_catalog import area_catalog
 
 
 if __name__ == '__main__':
@@ -14,13 +15,11 @@ if __name__ == '__main__':
     saxony_geojson_filepath = Path("overall_geojsons", "saxony.geojson")
     df_boundary = gpd.read_file(saxony_geojson_filepath)
 
-    water_saxony_geojson_filepath = Path("overall_geojsons", "water_only.geojson")
-    df = gpd.read_file(water_saxony_geojson_filepath)
-    df = df[~df['name'].isnull()]
-    df['name'] = df['name'].astype('str')
+    # all named water bodies of water_only.geojson, parsed once into the area catalog
+    areas = area_catalog().areas
+    df = areas[areas['source'] == 'water_only']
 
-    df["dam"] = df.name.apply(lambda x: "Talsperre" in x)
-    dams = df[df.dam]  # == True
+    dams = df[df['name'].str.contains("Talsperre", regex=False)]
     dams = dams.reset_index()
 
     print("Datagram contains {} dams.".format(dams.shape[0]))
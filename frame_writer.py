@@ -0,0 +1,114 @@
+import queue
+import threading
+import time
+import numpy as np
+import imageio
+from PIL import Image, ImageDraw, ImageFont
+
+
+class BackgroundFrameWriter:
+    """
+    Writes the frames of the assignment matrix animation (GIF) in a background thread.
+
+    Capturing a frame only copies the (downscaled) assignment matrix into a bounded queue. Interpolation to uint8,
+    PIL image creation and encoding happen in the writer thread, so the DARP loop doesn't wait for imageio.
+    If the queue is full, capturing blocks until the writer catches up, which keeps the memory usage bounded.
+    An error of the writer thread (e.g. a failing write or a missing font) gets raised again by the next add_frame or
+    close call, a dead writer never blocks the DARP loop.
+    """
+
+    def __init__(self, file_path, frame_stride: int = 5, downscale: int = 1, max_frames: int = None,
+                 queue_size: int = 64, duration: float = 0.15):
+        """
+        :param file_path: path of the GIF file to write
+
+        :param frame_stride: capture every frame_stride-th iteration (and always the first one)
+
+        :param downscale: keep only every downscale-th row and column of the assignment matrix
+
+        :param max_frames: stop capturing after this many frames, None for no limit
+
+        :param queue_size: maximum number of frames waiting for the encoder
+
+        :param duration: display duration of one frame in the GIF in seconds
+        """
+        self.frame_stride = max(1, int(frame_stride))
+        self.downscale = max(1, int(downscale))
+        self.max_frames = max_frames
+        self.captured_frames = 0
+
+        self.gif_writer = imageio.get_writer(file_path, mode='I', duration=duration)
+        self.frame_queue = queue.Queue(maxsize=queue_size)
+        self.encoder_error = None  # exception which stopped the writer thread
+        self.encoder_thread = threading.Thread(target=self.__encode_frames, daemon=True)
+        self.encoder_thread.start()
+
+    def wants_frame(self, iteration: int):
+        """
+        Check if the frame of this iteration would get captured, before building any frame data.
+        """
+        if self.max_frames is not None and self.captured_frames >= self.max_frames:
+            return False
+        return (iteration % self.frame_stride) == 0
+
+    def add_frame(self, iteration: int, assignment_matrix: np.ndarray, meta_text: str = None):
+        """
+        Copy the assignment matrix into the queue if the frame of this iteration is wanted.
+        """
+        if not self.wants_frame(iteration):
+            return
+
+        frame = assignment_matrix[::self.downscale, ::self.downscale].copy()
+        self.__put((frame, meta_text))
+        self.captured_frames += 1
+
+    def close(self):
+        """
+        Wait until all queued frames are encoded and close the GIF file.
+        """
+        try:
+            self.__put(None)
+            self.encoder_thread.join()
+            if self.encoder_error is not None:
+                raise RuntimeError("Writing the assignment matrix animation failed") from self.encoder_error
+        finally:
+            self.gif_writer.close()
+
+    def __put(self, item):
+        """
+        Queue a frame (or None to stop the writer), wait only as long as the writer thread is alive.
+        """
+        while True:
+            self.__raise_encoder_error()
+            try:
+                self.frame_queue.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                pass
+
+    def __raise_encoder_error(self):
+        if self.encoder_error is not None:
+            raise RuntimeError("Writing the assignment matrix animation failed") from self.encoder_error
+        if not self.encoder_thread.is_alive():
+            raise RuntimeError("The writer thread of the assignment matrix animation stopped")
+
+    def __encode_frames(self):
+        try:
+            for frame, meta_text in iter(self.frame_queue.get, None):
+                # TODO interpolate or scale?
+                uint8_array = np.uint8(np.interp(frame, (frame.min(), frame.max()), (0, 255)))
+                temp_img = Image.fromarray(uint8_array)  # mode="RGB"
+                if meta_text is not None:
+                    font = ImageFont.truetype("arial.ttf", 9)
+                    ImageDraw.Draw(temp_img).multiline_text((3, 3), meta_text, spacing=2, font=font)
+                self.gif_writer.append_data(np.asarray(temp_img))
+        except Exception as e:
+            self.encoder_error = e
+
+
+def darp_meta_text(iteration: int, init_robot_pos, seed_value, random_level, cc_variation, importance,
+                   desirable_assign, array_of_elements, connected_regions):
+    return f'{time.strftime("%H:%M:%S %d.%m.%Y")}\nInitial positions:\n{str(init_robot_pos)}\nSeed: ' \
+           f'{str(seed_value)}\nRandom Influence: {random_level}\nCriterion Matrix Variation: {cc_variation}\n' \
+           f'Importance: {importance}\nDesired Assignment:\n{str(desirable_assign)}\nAssignment per Robot:\n' \
+           f'{str(array_of_elements)}\nTiles Connected:\n{str(connected_regions)}\nIteration: {iteration}'
@@ -1,14 +1,21 @@
 import sys
 import geopandas as gpd
-from pathlib import Path
 import os
 import time
-from gridding_helpers import check_real_start_points
+import psutil
+from concurrent.futures import ProcessPoolExecutor, as_completed, wait, FIRST_COMPLETED
+from numba_threading import use_fork_safe_threading_layer
+if __name__ in ('__main__', '__mp_main__'):
+    # run as script (or a spawned worker of it): pick the threading layer before darp loads its parallel kernels
+    use_fork_safe_threading_layer()
+from grid_generation import check_real_start_points
 from path_planning_pre_calculation import generate_numpy_contour_array, get_random_start_points_list, \
     generate_stc_geodataframe, calc_length_meter
 from setting_helpers import load_yaml_config_file
+from disk_cache import cache_from_settings
+from artifact_io import read_newest_artifact, write_artifact, GeoFrameAccumulator
 from MultiRobotPathPlanner import MultiRobotPathPlanner
-import pandas
+import instrumentation
 import numpy as np
 from shapely.ops import linemerge
 
@@ -25,27 +32,226 @@ def generate_file_name(filename: str):
     return f_name
 
 
-def newest_grid_file_in_folder(path_to_folder):
+def plan_tile_group(tiles_group_identifier, sensor_line_length_meter, geometry, dict_tile_data: dict, settings: dict,
+                    export_file_name: str):
     """
-    Search latest file in folder with search_pattern 'grid' in its name.
+    DARP + path planning of one tile group (contour array, DARP, STC, GeoDataFrames), an independent job of the batch.
 
-    :param path_to_folder: Path relative to program execution folder
-    :return: file name without its suffix '.geojson'
+    :return: (subcells and lines GeoDataFrame, path per start point GeoDataFrame), both None if DARP found no solution
     """
-    search_pattern = ['grid']
-    files_in_folder = os.listdir(Path(path_to_folder).resolve())
-    files = [Path(path_to_folder, nm).resolve() for ps in search_pattern for nm in files_in_folder if ps in nm]
-    last_file_with_suffix = max(files, key=os.path.getctime)
-    return Path(last_file_with_suffix).name.removesuffix('.geojson')
+    # post gridding numpy contour bool array generation
+    with instrumentation.span('plan.contour_array'):
+        np_bool_array, gdf_numpy_positions = generate_numpy_contour_array(geometry, dict_tile_data)
+    relevant_tiles_count = np.count_nonzero(np_bool_array)
+    instrumentation.count('plan.tiles', int(relevant_tiles_count))
+
+    # TODO: search for start points within given area array
+    if settings['darp_random_seed_value'] is not None:
+        # a seeded run draws the same start points again, so its DARP result can come from the cache
+        np.random.seed(settings['darp_random_seed_value'])
+    start_points = get_random_start_points_list(5, np_bool_array)
+    dict_darp_startparameters = {}
+    for i, point_tuple in enumerate(start_points):
+        dict_darp_startparameters[i] = {'row': point_tuple[0],
+                                        'col': point_tuple[1],
+                                        'tiles_count': 150}
+
+    # settings['darp_random_seed_value']
+    try:
+        handle = MultiRobotPathPlanner(np_bool_array, settings['darp_max_iter'], settings['darp_cc_variation'],
+                                       settings['darp_random_level'], settings['darp_dynamic_tiles_threshold'],
+                                       dict_darp_startparameters, settings['darp_random_seed_value'],
+                                       settings['darp_trigger_importance'], False,
+                                       settings['trigger_image_export_final_assignment_matrix'],
+                                       settings['trigger_video_export_assignment_matrix_changes'],
+                                       f'{export_file_name}_{str(tiles_group_identifier)}',  # TODO a real name for every grid of tile_size x
+                                       settings['darp_geodesic_metric'],
+                                       settings['video_export_frame_stride'],
+                                       settings['video_export_downscale'],
+                                       settings['video_export_max_frames'],
+                                       settings['trigger_darp_trace_export'],
+                                       settings['path_planning_boustrophedon'],
+                                       settings['boustrophedon_max_transit_ratio'],
+                                       cache_from_settings(settings, 'darp'),
+                                       sensor_line_length_meter,
+                                       settings['mission_speed_meter_per_second'],
+                                       settings['mission_turn_duration_seconds'])
+    except SystemExit as e:
+        # DARP aborts with sys.exit on invalid start parameters or a not connected area, only skip this tile group
+        print(f'DARP aborted tile group {tiles_group_identifier} with exit code {e.code}')
+        return None, None
+
+    if not handle.darp_success:
+        return None, None
+
+    with instrumentation.span('plan.stc_geodataframe'):
+        gdf_path_one_multipoly = generate_stc_geodataframe(gdf_numpy_positions, handle.A,
+                                                           handle.best_case.paths, tiles_group_identifier)
+
+    # filter for lines only and unify them per start point, one pass over the groups in order of appearance
+    gdf_lines = gdf_path_one_multipoly[gdf_path_one_multipoly['line']]
+
+    data = []
+    for startpoint, line_geometries in gdf_lines.geometry.groupby(gdf_lines['assigned_startpoint'], sort=False):
+        path_multilinestring = linemerge(line_geometries.to_list())
+        # path_multilinestring = make_valid(unary_union(merged_lines))
+        print("Unified path lines!")
+
+        # calc the length of the path LineString / MultiLineString in meter
+        path_length = round(calc_length_meter(path_multilinestring), 2)
+
+        data.append({'tiles_group_identifier': str(tiles_group_identifier),
+                     'assigned_startpoint': startpoint,
+                     'sensor_line_length_meter': sensor_line_length_meter,
+                     'path_length_meter': path_length,
+                     'geometry': path_multilinestring})
+
+    if len(data) == 0:
+        return gdf_path_one_multipoly, gpd.GeoDataFrame()
+    gdf_path_per_multipoly = gpd.GeoDataFrame(data, crs=4326).set_geometry('geometry')
+    return gdf_path_one_multipoly, gdf_path_per_multipoly
+
+
+def init_tile_group_worker(numba_threads: int):
+    """
+    Every worker process gets its share of the cores for the parallel numba kernels and the path threads of
+    MultiRobotPathPlanner, and its own random state (forked workers would draw the same random start points otherwise).
+    """
+    import numba
+    numba.set_num_threads(max(1, min(numba_threads, numba.config.NUMBA_NUM_THREADS)))
+    np.random.seed()
+
+
+def plan_tile_groups(grid_gdf: gpd.GeoDataFrame, settings: dict, export_file_name: str, max_workers=None):
+    """
+    Run all tile groups of a finished grid concurrently in a process pool, see plan_streamed_tile_groups.
+
+    :return: (subcells and lines GeoDataFrame, path per tile group and start point GeoDataFrame) in grid order
+    """
+    return plan_streamed_tile_groups([grid_gdf], settings, export_file_name, max_workers)
+
+
+def plan_streamed_tile_groups(tile_group_gdfs, settings: dict, export_file_name: str, max_workers=None,
+                              max_pending=None):
+    """
+    Plan tile groups in a process pool while they are still being produced, e.g. by
+    grid_generation.generate_grid_per_line_width, see plan_tile_group_batches.
+
+    :param tile_group_gdfs: iterable of GeoDataFrames with tile groups (grid rows)
+
+    :return: (subcells and lines GeoDataFrame, path per tile group and start point GeoDataFrame) in the order the tile
+    groups were produced
+    """
+    batch_results = plan_tile_group_batches(((grid_gdf, settings, export_file_name) for grid_gdf in tile_group_gdfs),
+                                            max_workers, max_pending)
+
+    subcells_and_lines_collection = GeoFrameAccumulator()
+    path_per_multipoly = GeoFrameAccumulator()
+    for results in batch_results:
+        for gdf_path_one_multipoly, gdf_paths, _ in results:
+            subcells_and_lines_collection.append(gdf_path_one_multipoly)
+            path_per_multipoly.append(gdf_paths)
+
+    return subcells_and_lines_collection.to_geodataframe(), path_per_multipoly.to_geodataframe()
+
+
+def timed_plan_tile_group(*args):
+    """
+    plan_tile_group with its run time and its stage spans and counters (if the settings ask for a run report) in the
+    worker
+
+    :return: (subcells and lines GeoDataFrame, path per start point GeoDataFrame, seconds, instrumentation snapshot)
+    """
+    stage_recorder = instrumentation.configure_from_settings(args[4])  # a new recording for every tile group
+    start = time.time()
+    with stage_recorder.span('plan.tile_group'):
+        result = plan_tile_group(*args)
+    return (*result, time.time() - start, stage_recorder.snapshot())
+
+
+def plan_tile_group_batches(batches, max_workers=None, max_pending=None):
+    """
+    Plan batches of tile groups in one process pool while they are still being produced: every batch gets submitted
+    as soon as the iterable yields it, the biggest tile groups (most polygons) of it first so the longest DARP runs
+    start early. Results are collected in the main process as they arrive. A batch brings its own settings, so tile
+    groups of several areas can share the pool.
+
+    :param batches: iterable of (GeoDataFrame with tile groups (grid rows), settings, export file name)
+
+    :param max_workers: number of worker processes, None for the physical core count
+
+    :param max_pending: maximum count of submitted but unfinished tile groups, None for twice the worker count;
+    if reached, the producer of the batches waits until a tile group is finished
+
+    :return: list with a list per batch of (subcells and lines GeoDataFrame, path per start point GeoDataFrame,
+    seconds) per grid row, the GeoDataFrames are None if the tile group has no result; the stage spans and counters
+    of the workers get merged into the instrumentation recorder of this process
+    """
+    if max_workers is None:
+        max_workers = psutil.cpu_count(logical=False) or os.cpu_count()
+    max_workers = max(1, max_workers)
+    if max_pending is None:
+        max_pending = 2 * max_workers
+    numba_threads = max(1, (psutil.cpu_count(logical=True) or os.cpu_count()) // max_workers)
+
+    batch_results = []
+    futures = {}
+    finished = 0
+    submitted_total = 0  # tile groups of all batches produced so far
+    all_batches_produced = False
+
+    def collect(done_futures):
+        nonlocal finished
+        for future in done_futures:
+            batch_idx, idx, tiles_group_identifier, submit_time = futures.pop(future)
+            finished += 1
+            try:
+                gdf_path_one_multipoly, gdf_paths, seconds, stages = future.result()
+                batch_results[batch_idx][idx] = (gdf_path_one_multipoly, gdf_paths, seconds)
+                instrumentation.recorder().merge(stages)
+                state = "done" if gdf_path_one_multipoly is not None else "no DARP solution"
+            except Exception as e:
+                batch_results[batch_idx][idx] = (None, None, time.time() - submit_time)
+                state = f'failed: {e!r}'
+            # while batches are still produced the total is unknown, only count against the tile groups so far
+            progress = f'{finished}/{submitted_total}' if all_batches_produced \
+                else f'{finished} of {submitted_total} submitted'
+            print(f'[{progress}] tile group {tiles_group_identifier}: {state} '
+                  f'({(time.time() - submit_time) / 60:.2f} min)')
+
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=init_tile_group_worker,
+                             initargs=(numba_threads,)) as executor:
+        for batch_idx, (grid_gdf, settings, export_file_name) in enumerate(batches):
+            batch_results.append([None] * len(grid_gdf))
+            submitted_total += len(grid_gdf)
+            # biggest tile groups first
+            job_order = sorted(range(len(grid_gdf)), key=lambda i: len(grid_gdf.geometry.iloc[i].geoms), reverse=True)
+            for idx in job_order:
+                if len(futures) >= max_pending:
+                    collect(wait(futures, return_when=FIRST_COMPLETED).done)
+
+                geoserie = grid_gdf.iloc[idx]
+                dict_tile_data = {"tile_width": geoserie.tile_width,
+                                  "tile_height": geoserie.tile_height}
+                future = executor.submit(timed_plan_tile_group, geoserie.tiles_group_identifier,
+                                         geoserie.sensor_line_length_meter, geoserie.geometry, dict_tile_data,
+                                         settings, export_file_name)
+                futures[future] = (batch_idx, idx, geoserie.tiles_group_identifier, time.time())
+            print(f'Submitted {len(grid_gdf)} tile groups for path planning, {len(futures)} pending')
+
+        all_batches_produced = True
+        collect(as_completed(list(futures)))
+
+    return batch_results
 
 
 if __name__ == '__main__':
 
     settings = load_yaml_config_file('./settings/settings_talsperre_malter.yaml')
+    stage_recorder = instrumentation.configure_from_settings(settings)
 
-    last_file_no_suffix = newest_grid_file_in_folder(Path('geodataframes'))
-    grid_gdf = gpd.read_file(filename=f'./geodataframes/{last_file_no_suffix}.geojson')
-    print(f'Loaded grid file: ./geodataframes/{last_file_no_suffix}.geojson')
+    grid_gdf, _ = read_newest_artifact('grid', ['tiles_group_identifier', 'sensor_line_length_meter', 'tile_width',
+                                                'tile_height'])
 
     list_real_start_points_coords = settings['real_start_points']
     export_file_name = generate_file_name(settings['area_name'])
@@ -57,79 +263,20 @@ if __name__ == '__main__':
         # path pre-calculations
 
 
-        # go through all MutliPolygons of grid generation
+        # go through all MutliPolygons of grid generation, every tile group in its own worker process
         measure_start = time.time()
 
-        gdf_subcells_and_lines_collection = gpd.GeoDataFrame()
-        gdf_path_per_multipoly = gpd.GeoDataFrame()
-
-        for idx, geoserie in grid_gdf.iterrows():
-
-            dict_tile_data = {"tile_width": geoserie.tile_width,
-                              "tile_height": geoserie.tile_height}
-
-            # post gridding numpy contour bool array generation
-            np_bool_array, gdf_numpy_positions = generate_numpy_contour_array(geoserie.geometry, dict_tile_data)
-            relevant_tiles_count = np.count_nonzero(np_bool_array)
-
-            # TODO: search for start points within given area array
-            start_points = get_random_start_points_list(5, np_bool_array)
-            dict_darp_startparameters = {}
-            for i, point_tuple in enumerate(start_points):
-                dict_darp_startparameters[i] = {'row': point_tuple[0],
-                                                'col': point_tuple[1],
-                                                'tiles_count': 150}
-
-            # settings['darp_random_seed_value']
-            handle = MultiRobotPathPlanner(np_bool_array, settings['darp_max_iter'], settings['darp_cc_variation'],
-                                           settings['darp_random_level'], settings['darp_dynamic_tiles_threshold'],
-                                           dict_darp_startparameters, settings['darp_random_seed_value'],
-                                           settings['darp_trigger_importance'], False,
-                                           settings['trigger_image_export_final_assignment_matrix'],
-                                           settings['trigger_video_export_assignment_matrix_changes'],
-                                           f'{export_file_name}_{str(geoserie.tiles_group_identifier)}')  # TODO a real name for every grid of tile_size x
-            if handle.darp_success:
-                gdf_path_one_multipoly = generate_stc_geodataframe(gdf_numpy_positions, handle.darp_instance.A,
-                                                                   handle.best_case.paths,
-                                                                   geoserie.tiles_group_identifier)
-
-                # filter for lines only and try to unify them
-                list_all_startpoints = gdf_path_one_multipoly[gdf_path_one_multipoly['line']].assigned_startpoint.unique()
-
-                for idx_point, startpoint in enumerate(list_all_startpoints):
-                    temp = gdf_path_one_multipoly.query(f'line == True and assigned_startpoint == {startpoint}')
-                    path_multilinestring = linemerge(temp.geometry.to_list())
-                    # path_multilinestring = make_valid(unary_union(merged_lines))
-                    print("Unified path lines!")
-
-                    # calc the length of the path LineString / MultiLineString in meter
-                    path_length = round(calc_length_meter(path_multilinestring), 2)
-
-                    data = [{'tiles_group_identifier': str(geoserie.tiles_group_identifier),
-                             'assigned_startpoint': startpoint,
-                             'sensor_line_length_meter': geoserie.sensor_line_length_meter,
-                             'path_length_meter': path_length,
-                             'geometry': path_multilinestring}]
-
-                    gdf_one_multipoly_path = gpd.GeoDataFrame(data, crs=4326).set_geometry('geometry')
-                    gdf_path_per_multipoly = gpd.GeoDataFrame(pandas.concat([gdf_path_per_multipoly,
-                                                                             gdf_one_multipoly_path], axis=0,
-                                                                            ignore_index=True),
-                                                              crs=4326)
-                # finally append everything
-                gdf_subcells_and_lines_collection = gpd.GeoDataFrame(pandas.concat([gdf_subcells_and_lines_collection,
-                                                                                    gdf_path_one_multipoly], axis=0,
-                                                                                   ignore_index=True),
-                                                                     crs=4326)
+        gdf_subcells_and_lines_collection, gdf_path_per_multipoly = plan_tile_groups(
+            grid_gdf, settings, export_file_name, settings['max_parallel_tile_groups'])
 
         # save results to file before drawing
-        gdf_subcells_and_lines_collection.to_file(
-            filename=f'./geodataframes/{export_file_name}_subcells_and_lines_collection.geojson', driver="GeoJSON")
-        gdf_path_per_multipoly.to_file(filename=f'./geodataframes/{export_file_name}_path_per_tilegroup.geojson',
-                                       driver="GeoJSON")
+        write_artifact(gdf_subcells_and_lines_collection, export_file_name, 'subcells_and_lines_collection',
+                       settings['geojson_export'])
+        write_artifact(gdf_path_per_multipoly, export_file_name, 'path_per_tilegroup', settings['geojson_export'])
 
         measure_end = time.time()
         print("Elapsed time path generation (with darp): ", str((measure_end - measure_start) / 60), "min")
+        stage_recorder.write_report(export_file_name, script='get_darp_working', settings=settings)
 
         sys.exit(0)
 
@@ -1,6 +1,9 @@
 import sys
-from gridding_helpers import generate_file_name, generate_grid, read_biggest_area_polygon_from_file, Grid_Generation_Task_Manager
+from grid_generation import generate_file_name, generate_grid, read_biggest_area_polygon_from_file, Grid_Settings_Task_Manager
 import time
+from disk_cache import cache_from_settings
+from artifact_io import write_artifact
+import instrumentation
 from setting_helpers import load_yaml_config_file, write_yaml_config_file
 
 
@@ -8,12 +11,13 @@ if __name__ == '__main__':
     settings_yaml_filepath = './settings/settings_talsperre_malter.yaml'
     write_yaml_config_file(settings_yaml_filepath)
     settings = load_yaml_config_file(settings_yaml_filepath)
+    stage_recorder = instrumentation.configure_from_settings(settings)
 
     # find the Shapely Geometry (Multipolygon) of interest
     area_polygon = read_biggest_area_polygon_from_file(settings['area_name'])
 
     # create a task manager
-    task_manager = Grid_Generation_Task_Manager(settings['sensor_line_length_meter'], settings['polygon_threshold'], area_polygon, settings['area_name'])
+    task_manager = Grid_Settings_Task_Manager(settings['sensor_line_length_meter'], settings['polygon_threshold'], area_polygon)
     # Grid generation will be generic without any specification
     # the widest scanner line will get used to create the biggest grid
     # use the Notebook if you wanna specify the regions per scanner line width
@@ -21,16 +25,16 @@ if __name__ == '__main__':
     measure_start = time.time()
 
     # find biggest grid of highest value in sensor_line_length_meter
-    grid_gdf = generate_grid(task_manager)
+    grid_gdf = generate_grid(task_manager, cache_from_settings(settings, 'grid'))
 
+    file_name = generate_file_name(settings['area_name'])
     if not grid_gdf.empty:
         # save best results
-        file_name = generate_file_name(settings['area_name'])
-        grid_gdf.to_file(filename=f'./geodataframes/{file_name}_grid.geojson', driver="GeoJSON")
-        print("Successfully finished grid generation and saved geometry to file!\n",
-              f'./geodataframes/{file_name}_grid.geojson')
+        write_artifact(grid_gdf, file_name, 'grid', settings['geojson_export'])
+        print("Successfully finished grid generation and saved geometry to file!")
 
     measure_end = time.time()
     print("Elapsed time grid generation: ", (measure_end - measure_start), "sec")
+    stage_recorder.write_report(file_name, script='get_grid', settings=settings)
 
     sys.exit(0)
@@ -0,0 +1,66 @@
+import sys
+import os
+import time
+from numba_threading import use_fork_safe_threading_layer
+use_fork_safe_threading_layer()  # before darp loads its parallel kernels
+from grid_generation import generate_file_name, read_biggest_area_polygon_from_file, Grid_Settings_Task_Manager, \
+    generate_grid_per_line_width, check_real_start_points
+from disk_cache import cache_from_settings
+from artifact_io import write_artifact, GeoFrameAccumulator
+from setting_helpers import load_yaml_config_file, write_yaml_config_file
+from get_darp_working import plan_streamed_tile_groups
+import instrumentation
+
+
+os.environ['PYGAME_HIDE_SUPPORT_PROMPT'] = "hide"
+
+
+def stream_and_keep_grid(task_manager: Grid_Settings_Task_Manager, grid_collection: GeoFrameAccumulator,
+                         grid_cache=None):
+    """
+    Pass the tile groups of every scanner line width on as soon as they are found and keep them for the grid file.
+    """
+    for gdf_one_tile_size in generate_grid_per_line_width(task_manager, grid_cache):
+        grid_collection.append(gdf_one_tile_size)
+        yield gdf_one_tile_size
+
+
+if __name__ == '__main__':
+    # grid generation (get_grid.py) and path planning (get_darp_working.py) in one streaming pipeline:
+    # the tile groups of the widest scanner line get planned while the grids of the smaller ones are still generated
+    settings_yaml_filepath = './settings/settings_talsperre_malter.yaml'
+    write_yaml_config_file(settings_yaml_filepath)
+    settings = load_yaml_config_file(settings_yaml_filepath)
+    stage_recorder = instrumentation.configure_from_settings(settings)
+
+    if not check_real_start_points(settings['area_name'], settings['real_start_points']):
+        print("start points don't match the given lake area")
+        sys.exit(1)
+
+    # find the Shapely Geometry (Multipolygon) of interest
+    area_polygon = read_biggest_area_polygon_from_file(settings['area_name'])
+    task_manager = Grid_Settings_Task_Manager(settings['sensor_line_length_meter'], settings['polygon_threshold'],
+                                              area_polygon)
+
+    measure_start = time.time()
+    file_name = generate_file_name(settings['area_name'])
+    grid_collection = GeoFrameAccumulator()
+
+    grid_stream = stream_and_keep_grid(task_manager, grid_collection, cache_from_settings(settings, 'grid'))
+    gdf_subcells_and_lines_collection, gdf_path_per_multipoly = plan_streamed_tile_groups(
+        grid_stream, settings, file_name, settings['max_parallel_tile_groups'])
+
+    if len(grid_collection) > 0:
+        grid_collection.write(file_name, 'grid', settings['geojson_export'])
+
+    if not gdf_path_per_multipoly.empty:
+        write_artifact(gdf_subcells_and_lines_collection, file_name, 'subcells_and_lines_collection',
+                       settings['geojson_export'])
+        write_artifact(gdf_path_per_multipoly, file_name, 'path_per_tilegroup', settings['geojson_export'])
+
+    measure_end = time.time()
+    print("Elapsed time grid generation and path generation (with darp): ",
+          str((measure_end - measure_start) / 60), "min")
+    stage_recorder.write_report(file_name, script='get_grid_and_paths', settings=settings)
+
+    sys.exit(0)
@@ -0,0 +1,213 @@
+import os
+import sys
+import json
+import time
+import platform
+import threading
+import itertools
+import tracemalloc
+from pathlib import Path
+from contextlib import contextmanager, nullcontext
+import psutil
+
+
+RUN_REPORT_FOLDER = Path('run_reports')
+NO_SPAN = nullcontext()  # span of a disabled recorder
+
+# derived values of the run report: name -> (counter, 'seconds' of a span or 'count' of a counter, its name)
+RATES = {'darp.iterations_per_second': ('darp.iterations', 'seconds', 'darp.iterations'),
+         'darp.cells_reassigned_per_iteration': ('darp.cells_reassigned', 'count', 'darp.iterations'),
+         'darp.disconnected_regions_per_iteration': ('darp.disconnected_regions', 'count', 'darp.iterations'),
+         'plan.tiles_per_second': ('plan.tiles', 'seconds', 'plan.tile_group')}
+
+
+class StageRecorder:
+    """
+    Named spans (time, calls and memory per stage) and counters of one process. A disabled recorder only costs a
+    function call per span.
+
+    Spans are aggregated by name, e.g. all 'darp.iterations' spans of all tile groups of a run get summed up. The
+    memory of a span is the maximum resident set size at its end and, with trace_memory, the peak of the memory
+    allocated (Python objects and numpy arrays) by the whole process while the span was open, see tracemalloc.
+    """
+
+    def __init__(self, enabled: bool = False, trace_memory: bool = False):
+        self.enabled = enabled
+        self.trace_memory = enabled and trace_memory
+        self.started = time.strftime("%Y-%m-%d %H:%M:%S")
+        self.start_time = time.perf_counter()
+        self.spans = {}
+        self.counters = {}
+
+        self.__lock = threading.Lock()
+        self.__open_spans = {}  # token -> peak traced bytes, of all threads
+        self.__tokens = itertools.count()
+        self.__process = psutil.Process() if enabled else None
+        self.owns_tracing = self.trace_memory and not tracemalloc.is_tracing()  # stop tracing after the recording
+        if self.owns_tracing:
+            tracemalloc.start()
+
+    def span(self, name: str):
+        """
+        Context manager timing the stage with the given name.
+        """
+        if not self.enabled:
+            return NO_SPAN
+        return self.__timed_span(name)
+
+    @contextmanager
+    def __timed_span(self, name: str):
+        with self.__lock:
+            token = next(self.__tokens)
+            self.__update_peaks()
+            self.__open_spans[token] = 0
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            rss_bytes = self.__process.memory_info().rss
+            values = {'calls': 1, 'seconds': seconds, 'max_seconds': seconds, 'max_rss_bytes': rss_bytes}
+            with self.__lock:
+                self.__update_peaks()
+                peak_traced_bytes = self.__open_spans.pop(token)
+                if self.trace_memory:
+                    values['peak_traced_bytes'] = peak_traced_bytes
+                self.__add_span(name, values)
+
+    def count(self, name: str, value=1):
+        if self.enabled:
+            with self.__lock:
+                self.counters[name] = self.counters.get(name, 0) + value
+
+    def __update_peaks(self):
+        """
+        Hand the traced peak since the last span start or end to all open spans and start a new peak measurement.
+        """
+        if self.trace_memory:
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            for token in self.__open_spans:
+                self.__open_spans[token] = max(self.__open_spans[token], peak)
+
+    def __add_span(self, name: str, values: dict):
+        if name not in self.spans:
+            self.spans[name] = dict(values)
+            return
+        span = self.spans[name]
+        span['calls'] += values['calls']
+        span['seconds'] += values['seconds']
+        for key in ('max_seconds', 'max_rss_bytes', 'peak_traced_bytes'):
+            if key in values:
+                span[key] = max(span.get(key, 0), values[key])
+
+    def snapshot(self):
+        """
+        :return: spans and counters as plain dict, e.g. to send them from a worker process to the main process
+        """
+        with self.__lock:
+            return {'spans': {name: dict(span) for name, span in self.spans.items()}, 'counters': dict(self.counters)}
+
+    def merge(self, snapshot: dict):
+        """
+        Add the spans and counters of a snapshot (of a worker process) to this recorder.
+        """
+        if not self.enabled or not snapshot:
+            return
+        with self.__lock:
+            for name, span in snapshot['spans'].items():
+                self.__add_span(name, span)
+            for name, value in snapshot['counters'].items():
+                self.counters[name] = self.counters.get(name, 0) + value
+
+    def rates(self):
+        rates = {}
+        for rate_name, (counter_name, divisor_kind, divisor_name) in RATES.items():
+            if counter_name not in self.counters:
+                continue
+            if divisor_kind == 'seconds':
+                divisor = self.spans.get(divisor_name, {}).get('seconds', 0)
+            else:
+                divisor = self.counters.get(divisor_name, 0)
+            if divisor > 0:
+                rates[rate_name] = self.counters[counter_name] / divisor
+        return rates
+
+    def report(self, **extra):
+        """
+        Run report: machine, wall time, all spans sorted by their summed up time, counters and rates. Span times of
+        worker processes add up, so they can exceed the wall time.
+        """
+        snapshot = self.snapshot()
+        spans = dict(sorted(snapshot['spans'].items(), key=lambda item: item[1]['seconds'], reverse=True))
+        return {'started': self.started,
+                'wall_seconds': time.perf_counter() - self.start_time,
+                'machine': {'platform': platform.platform(),
+                            'python': sys.version.split()[0],
+                            'physical_cores': psutil.cpu_count(logical=False),
+                            'logical_cores': psutil.cpu_count(logical=True),
+                            'memory_bytes': psutil.virtual_memory().total},
+                'rss_bytes': psutil.Process().memory_info().rss,
+                'spans': spans,
+                'counters': snapshot['counters'],
+                'rates': self.rates(),
+                **extra}
+
+    def write_report(self, file_name: str, folder: Path = RUN_REPORT_FOLDER, **extra):
+        """
+        Save the run report as {file_name}_run_report.json, nothing happens if the recorder is disabled.
+
+        :return: path of the report or None
+        """
+        if not self.enabled:
+            return None
+        os.makedirs(folder, exist_ok=True)
+        file_path = Path(folder, f'{file_name}_run_report.json')
+        with open(file_path, 'w') as f:
+            json.dump(self.report(**extra), f, indent=2, default=str)
+        print("Saved run report to", file_path)
+        return file_path
+
+
+_recorder = StageRecorder()
+
+
+def recorder():
+    """
+    :return: the stage recorder of this process (disabled until configured)
+    """
+    return _recorder
+
+
+def configure(enabled: bool, trace_memory: bool = False):
+    """
+    Start a new recording in this process, e.g. at the start of a script or of a job in a worker process.
+    """
+    global _recorder
+    previous_recorder = _recorder
+    _recorder = StageRecorder(enabled, trace_memory)
+    if previous_recorder.owns_tracing:
+        if _recorder.trace_memory:
+            _recorder.owns_tracing = True
+        else:
+            tracemalloc.stop()
+    return _recorder
+
+
+def configure_from_settings(settings: dict):
+    return configure(settings.get('run_report', False), settings.get('run_report_trace_memory', False))
+
+
+def span(name: str):
+    """
+    Time a stage of this process: with span('darp.iterations'): ...
+    """
+    return _recorder.span(name)
+
+
+def count(name: str, value=1):
+    _recorder.count(name, value)
+
+
+def enabled():
+    return _recorder.enabled
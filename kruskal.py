@@ -1,66 +1,143 @@
-from Edges import Edge, Graph
+import numpy as np
+from numba import njit
+
+
+@njit("int32(int32[:], int32)", cache=True, nogil=True)
+def find_root(parent: np.ndarray, node: int):
+    """
+    Iterative find with path halving, no recursion limit for big regions.
+    """
+    while parent[node] != node:
+        parent[node] = parent[parent[node]]
+        node = parent[node]
+    return node
+
+
+@njit("int32[:, :](int32[:, :], int64[:], int64)", cache=True, nogil=True)
+def kruskal_mst(edges: np.ndarray,
+                order: np.ndarray,
+                num_nodes: int):
+    """
+    Kruskal with an integer union-find (union by rank) on array edges.
+
+    :param edges: (E x 2) array of src, dst node ids
+
+    :param order: edge indices sorted by weight
+
+    :param num_nodes: number of node ids in the graph
+
+    :return: (M x 2) array of the minimum spanning tree (forest) edges in the order they were chosen
+    """
+    parent = np.arange(num_nodes).astype(np.int32)
+    rank = np.zeros(num_nodes, dtype=np.int32)
+    mst = np.empty((max(num_nodes - 1, 0), 2), dtype=np.int32)
+    mst_count = 0
+
+    for k in order:
+        root1 = find_root(parent, edges[k, 0])
+        root2 = find_root(parent, edges[k, 1])
+
+        # Parents of the source and destination nodes are not in the same subset
+        # Add the edge to the spanning tree
+        if root1 != root2:
+            mst[mst_count, 0] = edges[k, 0]
+            mst[mst_count, 1] = edges[k, 1]
+            mst_count += 1
+            if rank[root1] < rank[root2]:
+                parent[root1] = root2
+            elif rank[root1] > rank[root2]:
+                parent[root2] = root1
+            else:
+                parent[root2] = root1
+                rank[root1] += 1
+
+            if mst_count == num_nodes - 1:
+                break
+
+    return mst[:mst_count]
+
+
+# cost functions of the modes to join edges in the MST, per edge source tile (row i, column j):
+# (cost of vertical edges, cost of horizontal edges); a new mode only needs a new entry here
+MST_MODES = {0: lambda i, j, rows, cols: (1, rows - i),
+             1: lambda i, j, rows, cols: (1, i + 1),
+             2: lambda i, j, rows, cols: (cols - j, 1),
+             3: lambda i, j, rows, cols: (j + 1, 1)}
 
 
 class Kruskal(object):
-    def __init__(self, rows, cols):
+    def __init__(self, rows, cols, row_offset=0, col_offset=0, grid_rows=None, grid_cols=None):
+        """
+        :param rows, cols: size of the (cropped) window the graph gets built on
+
+        :param row_offset, col_offset: position of the window inside the DARP grid
+
+        :param grid_rows, grid_cols: size of the whole DARP grid, the mode costs are computed in grid coordinates so
+        a cropped window gets the same MST as the whole grid
+        """
         self.rows = rows
         self.cols = cols
-        self.allEdges = []
+        self.row_offset = row_offset
+        self.col_offset = col_offset
+        self.grid_rows = rows if grid_rows is None else grid_rows
+        self.grid_cols = cols if grid_cols is None else grid_cols
         self.MAX_NODES = self.rows * self.cols
-        self.nodes = {}
-        for node in range(self.MAX_NODES):
-            self.nodes[node] = None
-        self.mst = []
-
-    def initializeGraph(self, A, connect4, mode):
-        cost1 = 1
-        cost2 = 1
-
-        for i in range(self.rows):
-            for j in range(self.cols):
-                if A[i][j]:
-                    if mode == 0:
-                        cost2 = self.rows - i
-                    elif mode == 1:
-                        cost2 = i + 1
-                    elif mode == 2:
-                        cost1 = self.cols - j
-                    elif mode == 3:
-                        cost1 = j + 1
-
-                    if i > 0 and A[i - 1][j]:
-                        self.AddToAllEdges(i * self.cols + j, (i - 1) * self.cols + j, cost1)
-                    if i < self.rows - 1 and A[i + 1][j]:
-                        self.AddToAllEdges(i * self.cols + j, (i + 1) * self.cols + j, cost1)
-                    if j > 0 and A[i][j - 1]:
-                        self.AddToAllEdges(i * self.cols + j, i * self.cols + j - 1, cost2)
-                    if j < self.cols - 1 and A[i][j + 1]:
-                        self.AddToAllEdges(i * self.cols + j, i * self.cols + j + 1, cost2)
-
-                    if not connect4:
-                        if i > 0 and j > 0 and A[i - 1][j - 1]:
-                            self.AddToAllEdges(i * self.cols + j, (i - 1) * self.cols + j - 1, 1)
-                        if i < self.rows - 1 and j < self.cols - 1 and A[i + 1][j + 1]:
-                            self.AddToAllEdges(i * self.cols + j, (i + 1) * self.cols + j + 1, 1)
-                        if i > self.rows - 1 and j > 0 and A[i + 1][j - 1]:
-                            self.AddToAllEdges(i * self.cols + j, (i + 1) * self.cols + j - 1, 1)
-                        if i > 0 and j < self.cols - 1 and A[i - 1][j + 1]:
-                            self.AddToAllEdges(i * self.cols + j, (i - 1) * self.cols + j + 1, 1)
-
-    def AddToAllEdges(self, _from: int, to: int, cost):
-        self.allEdges.insert(0, Edge(_from, to, cost))
-
-        if (self.nodes[_from]) is None:
-            self.nodes[_from] = set()
-            self.nodes[_from].add(_from)
-
-        if (self.nodes[to]) is None:
-            self.nodes[to] = set()
-            self.nodes[to].add(to)
-
-        return
-
-    def performKruskal(self):
-        g1 = Graph(self.nodes, self.allEdges)
-        g1.KruskalMST()
-        self.mst = g1.mst
+        self.edges = np.zeros((0, 2), dtype=np.int32)
+        self.edge_kinds = np.zeros(0, dtype=np.int8)
+        self.mst = np.zeros((0, 2), dtype=np.int32)
+
+    def initializeGraph(self, A, connect4):
+        """
+        Create the edges of every neighboured pair of region tiles once as int32 arrays, independent of the mode.
+
+        Edges keep the order of the former edge list: tiles row by row, per tile up, down, left, right (diagonals
+        if not connect4) and the whole list reversed, so equal weights get sorted like before.
+        """
+        region = np.asarray(A, dtype=bool)
+        rows, cols = self.rows, self.cols
+        node_ids = np.arange(self.MAX_NODES, dtype=np.int64).reshape(rows, cols)
+
+        # per direction: neighbour mask, node id offset, edge kind (0 vertical, 1 horizontal, 2 diagonal)
+        directions = [(np.zeros((rows, cols), dtype=bool), -cols, 0),
+                      (np.zeros((rows, cols), dtype=bool), cols, 0),
+                      (np.zeros((rows, cols), dtype=bool), -1, 1),
+                      (np.zeros((rows, cols), dtype=bool), 1, 1)]
+        directions[0][0][1:, :] = region[1:, :] & region[:-1, :]
+        directions[1][0][:-1, :] = region[:-1, :] & region[1:, :]
+        directions[2][0][:, 1:] = region[:, 1:] & region[:, :-1]
+        directions[3][0][:, :-1] = region[:, :-1] & region[:, 1:]
+
+        if not connect4:
+            directions.extend([(np.zeros((rows, cols), dtype=bool), -cols - 1, 2),
+                               (np.zeros((rows, cols), dtype=bool), cols + 1, 2),
+                               (np.zeros((rows, cols), dtype=bool), cols - 1, 2),
+                               (np.zeros((rows, cols), dtype=bool), -cols + 1, 2)])
+            directions[4][0][1:, 1:] = region[1:, 1:] & region[:-1, :-1]
+            directions[5][0][:-1, :-1] = region[:-1, :-1] & region[1:, 1:]
+            directions[6][0][:-1, 1:] = region[:-1, 1:] & region[1:, :-1]
+            directions[7][0][1:, :-1] = region[1:, :-1] & region[:-1, 1:]
+
+        masks = np.stack([d[0] for d in directions], axis=-1).reshape(-1)
+        sources = np.repeat(node_ids.reshape(-1), len(directions))[masks]
+        offsets = np.tile(np.array([d[1] for d in directions], dtype=np.int64), self.MAX_NODES)[masks]
+        kinds = np.tile(np.array([d[2] for d in directions], dtype=np.int8), self.MAX_NODES)[masks]
+
+        self.edges = np.stack([sources, sources + offsets], axis=-1)[::-1].astype(np.int32)
+        self.edge_kinds = kinds[::-1].copy()
+
+    def edge_weights(self, mode):
+        """
+        Weights of all graph edges for one of the MST_MODES, vectorized over the edge set.
+        """
+        src_rows = self.edges[:, 0].astype(np.int64) // self.cols + self.row_offset
+        src_cols = self.edges[:, 0].astype(np.int64) % self.cols + self.col_offset
+        cost1, cost2 = MST_MODES[mode](src_rows, src_cols, self.grid_rows, self.grid_cols)
+        weights = np.ones(len(self.edges), dtype=np.int64)
+        weights[self.edge_kinds == 0] = np.broadcast_to(cost1, weights.shape)[self.edge_kinds == 0]
+        weights[self.edge_kinds == 1] = np.broadcast_to(cost2, weights.shape)[self.edge_kinds == 1]
+        return weights
+
+    def performKruskal(self, mode):
+        order = np.argsort(self.edge_weights(mode), kind='stable').astype(np.int64)
+        self.mst = kruskal_mst(self.edges, order, self.MAX_NODES)
+        return self.mst
@@ -0,0 +1,17 @@
+import os
+import sys
+from numba import config
+
+
+def use_fork_safe_threading_layer():
+    """
+    Select the numba threading layer of this process. Call it at the start of a script, before darp gets imported:
+    loading the cached parallel kernels of darp starts the threading layer and fixes it for the whole process.
+
+    The multiprocessing workers of the path pre-calculation and the tile group pool get forked on Linux / macOS after
+    the parallel kernels ran, with the TBB (or GNU OpenMP) threading layer these forked children or the main process
+    never exit; workqueue is safe for that (Windows always spawns). A threading layer set in NUMBA_THREADING_LAYER is
+    kept.
+    """
+    if sys.platform != 'win32' and 'NUMBA_THREADING_LAYER' not in os.environ:
+        config.THREADING_LAYER = 'workqueue'
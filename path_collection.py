@@ -0,0 +1,64 @@
+import numpy as np
+
+
+class PathCollection:
+    """
+    Paths of several robots in one contiguous int32 (N x 4) array of moves (previous row, previous column, row,
+    column on the subcell grid). The moves of path r are moves[offsets[r]:offsets[r + 1]].
+
+    Indexing and iterating give the (n x 4) views of the single paths, so it can be used like a list of paths.
+    """
+
+    def __init__(self, moves: np.ndarray, offsets: np.ndarray):
+        self.moves = np.ascontiguousarray(moves, dtype=np.int32).reshape(-1, 4)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+
+    @classmethod
+    def from_paths(cls, paths):
+        """
+        :param paths: list of (n x 4) path arrays
+        """
+        offsets = np.zeros(len(paths) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(path) for path in paths])
+        moves = np.concatenate([np.asarray(path, dtype=np.int32).reshape(-1, 4) for path in paths] +
+                               [np.zeros((0, 4), dtype=np.int32)])
+        return cls(moves, offsets)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, path_idx):
+        if path_idx < 0:
+            path_idx += len(self)
+        if not 0 <= path_idx < len(self):
+            raise IndexError(f'path index {path_idx} out of range for {len(self)} paths')
+        return self.moves[self.offsets[path_idx]:self.offsets[path_idx + 1]]
+
+    def __iter__(self):
+        for path_idx in range(len(self)):
+            yield self[path_idx]
+
+    @property
+    def lengths(self):
+        return np.diff(self.offsets)
+
+    @property
+    def path_ids(self):
+        """
+        Path (robot) index of every move
+        """
+        return np.repeat(np.arange(len(self)), self.lengths)
+
+    def select(self, path_indices):
+        """
+        New collection of the given paths in the given order, e.g. the best mode of every robot.
+        """
+        return PathCollection.from_paths([self[int(path_idx)] for path_idx in path_indices])
+
+    def save(self, file_path):
+        np.savez_compressed(file_path, moves=self.moves, offsets=self.offsets)
+
+    @classmethod
+    def load(cls, file_path):
+        with np.load(file_path) as data:
+            return cls(data['moves'], data['offsets'])
@@ -1,5 +1,4 @@
 import time
-import copy
 from collections import defaultdict
 import geopandas as gpd
 import numpy as np
@@ -12,6 +11,7 @@ from shapely.geometry import Polygon, MultiPolygon, LineString, box, MultiLineSt
 from shapely.ops import unary_union, nearest_points
 from shapely.validation import make_valid
 from shapely import speedups
+from path_collection import PathCollection
 
 if speedups.available:
     speedups.enable()
@@ -89,6 +89,22 @@ def calc_length_meter(shapely_obj):
     return length_meter
 
 
+def calc_area_square_meter(shapely_obj):
+    """
+    Calculation of the area in square meter.
+
+    :param shapely_obj: Shapely Object like Polygon or MultiPolygon
+
+    :return: Area in square meter
+    """
+
+    geod = Geod(ellps="WGS84")
+
+    area_square_meter, _ = geod.geometry_area_perimeter(shapely_obj)
+
+    return abs(area_square_meter)
+
+
 def search_closest_polygon_to_start_points(list_start_point_coords: list, grid_gdf: gpd.GeoDataFrame):
     """
     Search the closest to the startpoint Polygon in every MultiPolygon. Check all available real Start Points.
@@ -111,7 +127,8 @@ def search_closest_polygon_to_start_points(list_start_point_coords: list, grid_g
     return nearest_poly_to_start_point_dict
 
 
-def generate_stc_geodataframe(input_gdf: gpd.GeoDataFrame, assignment_matrix: np.ndarray, paths, tiles_group_identifier):
+def generate_stc_geodataframe(input_gdf: gpd.GeoDataFrame, assignment_matrix: np.ndarray, paths: PathCollection,
+                              tiles_group_identifier):
     print("Start dividing every polygon from grid generation into 4 subcells for usage in STC.")
     task_queue = Queue()
     done_queue = Queue()
@@ -153,49 +170,32 @@ def generate_stc_geodataframe(input_gdf: gpd.GeoDataFrame, assignment_matrix: np
           "Creating LineStrings from subcell centroids.")
     measure_start = time.time()
     # create path from lines (centroid for centroid) and keep the assigned_startpoint for the geodataframe
-    task_queue = Queue()
-    done_queue = Queue()
-    process_count = 1  # psutil.cpu_count(logical=False)  # only physical available core count for this task
-
-    list_data_dicts = []
-    task_counter = 0
-    for ix_startpoint, segment in enumerate(paths):
-        for line_tuples in segment:
-            one_task = [task_counter, generate_linestring_data, (line_tuples, ix_startpoint, tiles_group_identifier)]
-            task_queue.put(one_task)
-            task_counter += 1
-
-    # if a lot of work needs to be done then copy the original list_subcells_dicts and give every process its own
-    list_of_deepcopys = [list_subcells_dicts]
-    for i in range(process_count - 1):
-        list_of_deepcopys.append(copy.deepcopy(list_subcells_dicts))
-
-    # start search_worker with their own copy of list_subcells_dicts
-    for i in range(process_count):
-        # using search worker generates a lot of memory usage, cause of copys, so increase value with care
-        Process(target=search_worker, args=(task_queue, done_queue, list_of_deepcopys[i])).start()
-
-    for _ in tqdm(range(task_counter)):
-        try:
-            idx, data_dict = done_queue.get()
-            if len(data_dict) > 0:
-                list_data_dicts.append(data_dict)
-                # append, not extend: new geoseries is just one line with assigned start point etc
-
-        except queue.Empty as e:
-            print(e)
-
-    # Tell child processes to stop
-    for i in range(process_count):
-        task_queue.put('STOP')
-
-    task_queue.close()
-    done_queue.close()
+    # centroids of the subcells looked up by their subcell row and column for all moves at once
+    subcell_rows = np.array([item['row_idx'] for item in list_subcells_dicts], dtype=np.int64)
+    subcell_cols = np.array([item['column_idx'] for item in list_subcells_dicts], dtype=np.int64)
+    centroids = np.array([item['geometry'].centroid.coords[0] for item in list_subcells_dicts]).reshape(-1, 2)
+    lookup_shape = (max(subcell_rows.max(initial=-1), paths.moves[:, [0, 2]].max(initial=-1)) + 1,
+                    max(subcell_cols.max(initial=-1), paths.moves[:, [1, 3]].max(initial=-1)) + 1)
+    subcell_lookup = np.full(lookup_shape, -1, dtype=np.int64)
+    subcell_lookup[subcell_rows, subcell_cols] = np.arange(len(list_subcells_dicts))
+
+    p1_idx = subcell_lookup[paths.moves[:, 0], paths.moves[:, 1]]
+    p2_idx = subcell_lookup[paths.moves[:, 2], paths.moves[:, 3]]
+    valid_moves = (p1_idx >= 0) & (p2_idx >= 0)
+    line_coords = np.stack([centroids[p1_idx[valid_moves]], centroids[p2_idx[valid_moves]]], axis=1)
+
+    gdf_trajectory_paths = gpd.GeoDataFrame({'tiles_group_identifier': tiles_group_identifier,
+                                             'row_idx': np.nan,
+                                             'column_idx': np.nan,
+                                             'assigned_startpoint': paths.path_ids[valid_moves],
+                                             'poly': False,
+                                             'line': True,
+                                             'geometry': [LineString(coords) for coords in line_coords]},
+                                            geometry='geometry', crs=4326)
     measure_end = time.time()
     print("Measured time LineString path generation: ", (measure_end - measure_start), " sec")
 
     gdf_subcells = gpd.GeoDataFrame(list_subcells_dicts, crs=4326).set_geometry('geometry')
-    gdf_trajectory_paths = gpd.GeoDataFrame(list_data_dicts, crs=4326).set_geometry('geometry')
 
     gdf_collection = gpd.GeoDataFrame(pandas.concat([gdf_subcells, gdf_trajectory_paths], axis=0, ignore_index=True),
                                       crs=gdf_trajectory_paths.crs)
@@ -206,31 +206,6 @@ def generate_stc_geodataframe(input_gdf: gpd.GeoDataFrame, assignment_matrix: np
     return gdf_collection
 
 
-def generate_linestring_data(list_of_subcells_dicts, line_tuples, assigned_startpoint, tiles_group_identifier):
-    # p1 row index, p1 column index, p2 row index, p2 column index = line_tuples
-    p1_r_i, p1_c_i, p2_r_i, p2_c_i = line_tuples
-
-    p1 = next((item['geometry'] for item in list_of_subcells_dicts if
-               (item["column_idx"] == p1_c_i and item["row_idx"] == p1_r_i)), None)
-    p2 = next((item['geometry'] for item in list_of_subcells_dicts if
-               (item["column_idx"] == p2_c_i and item["row_idx"] == p2_r_i)), None)
-
-    if p1 is not None and p2 is not None:
-
-        data = {'tiles_group_identifier': tiles_group_identifier,
-                'row_idx': np.nan,
-                'column_idx': np.nan,
-                'assigned_startpoint': assigned_startpoint,
-                'poly': False,
-                'line': True,
-                'geometry': LineString([p1.centroid, p2.centroid])}
-
-    else:
-        data = {}
-
-    return data
-
-
 def divide_polygon(row_idx, column_idx, poly: Polygon, assigned_startpoint, tiles_group_identifier):
     minx, miny, maxx, maxy = poly.bounds
 
@@ -369,13 +344,3 @@ def worker(input_queue, output_queue):
     for idx, func, args in iter(input_queue.get, 'STOP'):
         result = func(*args)
         output_queue.put([idx, result])
-
-
-def search_worker(input_queue, output_queue, list_too_search):
-    """
-    Necessary worker for python multiprocessing
-    Has an Index, if needed...
-    """
-    for idx, func, args in iter(input_queue.get, 'STOP'):
-        result = func(list_too_search, *args)
-        output_queue.put([idx, result])
@@ -0,0 +1,178 @@
+import os
+import sys
+import time
+import argparse
+from pathlib import Path
+import pandas
+from shapely.ops import unary_union
+from numba_threading import use_fork_safe_threading_layer
+use_fork_safe_threading_layer()  # before darp loads its parallel kernels
+from grid_generation import generate_file_name, read_biggest_area_polygon_from_file, Grid_Settings_Task_Manager, \
+    generate_grid_per_line_width, check_real_start_points
+from path_planning_pre_calculation import calc_area_square_meter
+from get_darp_working import plan_tile_group_batches
+from artifact_io import GeoFrameAccumulator
+from area_catalog import AreaCatalog
+from disk_cache import cache_from_settings
+from setting_helpers import load_yaml_config_file
+import instrumentation
+
+
+os.environ['PYGAME_HIDE_SUPPORT_PROMPT'] = "hide"
+
+
+def area_settings(base_settings: dict, area_name: str, area_settings_dir: Path):
+    """
+    Settings of one area: the base settings, overwritten by the entries of <area_settings_dir>/<area name>.yaml if it
+    exists. The real_start_points of the base settings only belong to its own area_name.
+    """
+    settings = dict(base_settings)
+    if settings.get('area_name') != area_name:
+        settings['real_start_points'] = []
+    settings['area_name'] = area_name
+
+    area_settings_file = Path(area_settings_dir, f'{area_name}.yaml')
+    if area_settings_file.exists():
+        settings.update(load_yaml_config_file(area_settings_file) or {})
+    return settings
+
+
+class Area_Run:
+    """
+    State and results of one area of the batch.
+    """
+
+    def __init__(self, area_name: str, settings: dict, catalog: AreaCatalog):
+        self.area_name = area_name
+        self.settings = settings
+        self.catalog = catalog  # area catalog of the areas folder, holds the polygon of this area
+        self.export_file_name = generate_file_name(area_name)
+        self.status = 'pending'
+        self.area_polygon = None
+        self.grid_collection = GeoFrameAccumulator()
+        self.batch_indices = []  # indices of the tile group batches of this area in plan_tile_group_batches
+        self.grid_seconds = 0.0
+
+    def summary(self, batch_results: list, output_dir: Path):
+        """
+        Save the grid and path results of the area into output_dir/<area> and summarize them.
+        """
+        results = [result for batch_idx in self.batch_indices for result in batch_results[batch_idx]]
+        subcells_and_lines_collection = GeoFrameAccumulator()
+        path_per_multipoly = GeoFrameAccumulator()
+        for gdf_path_one_multipoly, gdf_paths, _ in results:
+            subcells_and_lines_collection.append(gdf_path_one_multipoly)
+            path_per_multipoly.append(gdf_paths)
+
+        area_output_dir = Path(output_dir, self.export_file_name)
+        geojson_export = self.settings.get('geojson_export', False)
+        if len(self.grid_collection) > 0:
+            self.grid_collection.write(self.export_file_name, 'grid', geojson_export, area_output_dir)
+        if len(path_per_multipoly) > 0:
+            subcells_and_lines_collection.write(self.export_file_name, 'subcells_and_lines_collection',
+                                                geojson_export, area_output_dir)
+            path_per_multipoly.write(self.export_file_name, 'path_per_tilegroup', geojson_export, area_output_dir)
+
+        grid_gdf = self.grid_collection.to_geodataframe()
+        planned = [gdf_paths is not None for _, gdf_paths, _ in results]
+        gdf_paths = path_per_multipoly.to_geodataframe()
+
+        lake_area = calc_area_square_meter(self.area_polygon) if self.area_polygon is not None else 0.0
+        planned_area = calc_area_square_meter(unary_union(list(grid_gdf.geometry[planned]))) if any(planned) else 0.0
+        if self.status == 'pending':
+            if len(grid_gdf) == 0:
+                self.status = 'no tile groups'
+            else:
+                self.status = 'done' if any(planned) else 'no paths'
+
+        return {'area_name': self.area_name,
+                'status': self.status,
+                'tile_groups': len(grid_gdf),
+                'planned_tile_groups': sum(planned),
+                'paths': len(gdf_paths),
+                'path_length_meter': round(float(gdf_paths['path_length_meter'].sum()) if len(gdf_paths) else 0.0, 2),
+                'lake_area_square_meter': round(lake_area, 2),
+                'planned_area_square_meter': round(planned_area, 2),
+                'coverage_percent': round(100 * planned_area / lake_area, 2) if lake_area > 0 else 0.0,
+                'grid_seconds': round(self.grid_seconds, 2),
+                'planning_seconds': round(sum(seconds for _, _, seconds in results), 2),
+                'results': str(area_output_dir) if any(planned) else ''}
+
+
+def generate_area_batches(area_runs: list):
+    """
+    Generator of the tile group batches (one per scanner line width) of all areas, one area after another. An area
+    which fails the start point check or the grid settings gets skipped with its status.
+    """
+    batch_idx = 0
+    for area_run in area_runs:
+        settings = area_run.settings
+        grid_start = time.time()
+        try:
+            if not check_real_start_points(area_run.area_name, settings['real_start_points'], area_run.catalog):
+                area_run.status = 'start points not in area'
+                continue
+            area_run.area_polygon = read_biggest_area_polygon_from_file(area_run.area_name, area_run.catalog)
+            task_manager = Grid_Settings_Task_Manager(settings['sensor_line_length_meter'],
+                                                      settings['polygon_threshold'], area_run.area_polygon)
+            for gdf_one_tile_size in generate_grid_per_line_width(task_manager, cache_from_settings(settings, 'grid')):
+                area_run.grid_collection.append(gdf_one_tile_size)
+                area_run.batch_indices.append(batch_idx)
+                batch_idx += 1
+                # the time the pool needs for the batch doesn't count for the grid
+                area_run.grid_seconds += time.time() - grid_start
+                yield gdf_one_tile_size, settings, area_run.export_file_name
+                grid_start = time.time()
+        except SystemExit as e:
+            # grid settings checks abort with sys.exit, only skip this area
+            area_run.status = f'aborted with exit code {e.code}'
+        except Exception as e:
+            area_run.status = f'failed: {e!r}'
+        area_run.grid_seconds += time.time() - grid_start
+        print(f'Grid generation of {area_run.area_name} finished ({area_run.grid_seconds:.2f} sec)')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Grid generation and path planning for all areas of a folder, the "
+                                                 "tile groups of all areas share one pool of worker processes.")
+    parser.add_argument('--areas-dir', default='dams_single_geojsons',
+                        help="folder with one GeoJSON file per area, named after the area")
+    parser.add_argument('--areas', nargs='*', default=None, help="only these area names, all areas if not set")
+    parser.add_argument('--settings', default='./settings/settings_talsperre_malter.yaml',
+                        help="base settings for all areas")
+    parser.add_argument('--area-settings-dir', default='./settings/areas',
+                        help="folder with optional <area name>.yaml files overwriting base settings per area")
+    parser.add_argument('--max-workers', type=int, default=None,
+                        help="worker processes for all areas together, physical core count if not set")
+    parser.add_argument('--output-dir', default='./batch_results', help="folder for the results and summary.csv")
+    args = parser.parse_args()
+
+    base_settings = load_yaml_config_file(args.settings)
+    stage_recorder = instrumentation.configure_from_settings(base_settings)
+    # the polygons come from the files of the areas folder, not from the default catalog sources
+    catalog = AreaCatalog([('areas_dir', Path(args.areas_dir))])
+    area_names = sorted(catalog.names())
+    if args.areas:
+        area_names = [area_name for area_name in area_names if area_name in args.areas]
+    print("Planning", len(area_names), "areas")
+
+    measure_start = time.time()
+    area_runs = [Area_Run(area_name, area_settings(base_settings, area_name, args.area_settings_dir), catalog)
+                 for area_name in area_names]
+    max_workers = args.max_workers if args.max_workers is not None else base_settings.get('max_parallel_tile_groups')
+    batch_results = plan_tile_group_batches(generate_area_batches(area_runs), max_workers)
+
+    summary = pandas.DataFrame([area_run.summary(batch_results, args.output_dir) for area_run in area_runs])
+    os.makedirs(args.output_dir, exist_ok=True)
+    batch_file_name = generate_file_name("batch")
+    summary_file = Path(args.output_dir, f'{batch_file_name}_summary.csv')
+    summary.to_csv(summary_file, index=False)
+    print(summary.to_string(index=False))
+    print("Saved summary to", summary_file)
+
+    measure_end = time.time()
+    print("Elapsed time batch: ", str((measure_end - measure_start) / 60), "min")
+    stage_recorder.write_report(batch_file_name, args.output_dir, script='plan_all_areas', settings=base_settings,
+                                max_workers=max_workers, areas=summary.to_dict(orient='records'))
+
+    sys.exit(0)
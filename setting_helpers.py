@@ -13,15 +13,32 @@ def write_yaml_config_file(str_filepath):
                       'polygon_threshold': [5, 4, 2],  # always keep the same count of numbers here as in sensor_line_length_meter
                       # polygon groups with given number below this value will be considered irrelevant
                       # index is equivalent to index of edge length
+                      'grid_cache': False,  # reuse grids of unchanged areas and scanner line widths from ./cache/grid (keeps their random offset)
+                      'grid_cache_max_size_mb': 512,  # least recently used grids get removed above this size
                       'max_distance_per_task': 10000,  # in meter
+                      'max_parallel_tile_groups': None,  # tile groups planned at once, None for the physical core count
+                      'geojson_export': False,  # results get saved as GeoParquet, additionally as GeoJSON for other programs
+                      'run_report': True,  # time, memory and counters of every stage as JSON file in ./run_reports
+                      'run_report_trace_memory': False,  # peak allocated memory per stage, slows the whole run down
                       'trigger_image_export_final_assignment_matrix': False,  # recommended only for debugging purposes
                       'trigger_video_export_assignment_matrix_changes': False,  # recommended only for debugging purposes
+                      'video_export_frame_stride': 5,  # write every n-th DARP iteration into the animation
+                      'video_export_downscale': 1,  # keep only every n-th row and column of the assignment matrix
+                      'video_export_max_frames': None,  # stop writing frames after this count, None for no limit
+                      'trigger_darp_trace_export': False,  # record DARP assignment changes per iteration, see darp_trace.py
                       'darp_max_iter': 100000,
                       'darp_dynamic_tiles_threshold': 500,  # if darp hits iter max, will increase by 10 until this threshold reached
                       'darp_cc_variation': 0.01,
                       'darp_random_level': 0.0001,
                       'darp_random_seed_value': None,
-                      'darp_trigger_importance': False
+                      'darp_trigger_importance': False,
+                      'darp_geodesic_metric': False,  # initial metric as in-lake shortest path (for lakes with arms)
+                      'darp_cache': True,  # reuse DARP and path results of seeded runs from ./cache/darp
+                      'darp_cache_max_size_mb': 1024,  # least recently used results get removed above this size
+                      'path_planning_boustrophedon': False,  # lawn-mower sweep for convex robot regions if it beats STC (open path)
+                      'boustrophedon_max_transit_ratio': 0.1,  # max share of cells a sweep may drive over twice
+                      'mission_speed_meter_per_second': 1.0,  # survey speed for the estimated mission times
+                      'mission_turn_duration_seconds': 0.0  # additional time of one turn for the estimated mission times
                       }
 
     with open(str_filepath, 'w') as f:
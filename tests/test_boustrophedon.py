@@ -0,0 +1,91 @@
+import os
+import sys
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from boustrophedon import boustrophedon_path
+from MultiRobotPathPlanner import MultiRobotPathPlanner
+
+
+def cells_to_path(cells):
+    cells = np.array(cells, dtype=np.int32)
+    return np.concatenate([cells[:-1], cells[1:]], axis=1)
+
+
+def tile_region(tiles: np.ndarray):
+    """
+    Subcell region (2x2 per tile) of a tile region.
+    """
+    return np.repeat(np.repeat(tiles, 2, axis=0), 2, axis=1).astype(bool)
+
+
+def plan(tiles: np.ndarray, start: tuple, boustrophedon: bool):
+    start_parameters = {0: {'row': start[0], 'col': start[1], 'tiles_count': int(np.count_nonzero(tiles))}}
+    return MultiRobotPathPlanner(tiles, 100, 0.01, 0.0001, 10, start_parameters, 1, False, False, False, False,
+                                 'test_boustrophedon', boustrophedon=boustrophedon)
+
+
+@pytest.mark.parametrize('tiles, start', [
+    (np.ones((3, 5), dtype=bool), (0, 0)),
+    (np.ones((5, 3), dtype=bool), (4, 2)),
+    (np.array([[0, 1, 1, 0],
+               [1, 1, 1, 1],
+               [1, 1, 1, 0]], dtype=bool), (0, 1)),
+])
+def test_sweep_covers_every_subcell_of_the_region(tiles, start):
+    region = tile_region(tiles)
+    path = boustrophedon_path(region, (2 * start[0], 2 * start[1]), max_transit_ratio=1.0)
+
+    assert path is not None
+    assert np.array_equal(path[1:, :2], path[:-1, 2:])
+    assert np.all(np.abs(path[:, 0] - path[:, 2]) + np.abs(path[:, 1] - path[:, 3]) == 1)
+    visited = np.zeros_like(region)
+    visited[path[:, 0], path[:, 1]] = True
+    visited[path[:, 2], path[:, 3]] = True
+    assert np.array_equal(visited, region)
+
+
+def test_no_sweep_for_a_region_with_a_gap_in_every_direction():
+    tiles = np.array([[1, 1, 1],
+                      [1, 0, 1],
+                      [1, 1, 1]], dtype=bool)
+    assert boustrophedon_path(tile_region(tiles), (0, 0), max_transit_ratio=1.0) is None
+
+
+def test_sweep_only_replaces_the_stc_path_if_it_is_strictly_better():
+    planner = MultiRobotPathPlanner.__new__(MultiRobotPathPlanner)
+    planner.mission_parameters = {'subcell_length': 1.0, 'speed': 1.0, 'turn_duration': 0.0}
+    # 2 turns, 4 moves
+    stc_path = cells_to_path([(0, 0), (0, 1), (1, 1), (2, 1), (2, 2)])
+    worse_stc_path = cells_to_path([(0, 0), (0, 1), (1, 1), (1, 2), (2, 2)])
+    mode_paths = [worse_stc_path, stc_path, stc_path, worse_stc_path]
+
+    # same turns, longer
+    longer_sweep = cells_to_path([(0, 0), (0, 1), (0, 2), (1, 2), (2, 2), (2, 1)])
+    assert planner.selectBestMode(mode_paths, longer_sweep) == 1
+    # fewer turns, but more moves
+    straight_but_longer_sweep = cells_to_path([(0, 0), (0, 1), (0, 2), (0, 3), (1, 3), (2, 3)])
+    assert planner.selectBestMode(mode_paths, straight_but_longer_sweep) == 1
+    # fewer turns and not longer
+    better_sweep = cells_to_path([(0, 0), (0, 1), (0, 2), (1, 2), (2, 2)])
+    assert planner.selectBestMode(mode_paths, better_sweep) == len(mode_paths)
+    assert planner.selectBestMode(mode_paths) == 1
+
+    # turns take long: fewer turns make up for the longer path
+    planner.mission_parameters['turn_duration'] = 10.0
+    assert planner.selectBestMode(mode_paths, straight_but_longer_sweep) == len(mode_paths)
+
+
+def test_robot_without_sweep_keeps_its_closed_stc_path():
+    tiles = np.array([[1, 1, 1, 1],
+                      [1, 0, 0, 1],
+                      [1, 1, 1, 1]], dtype=bool)
+    stc_only = plan(tiles, (0, 0), boustrophedon=False)
+    with_sweep = plan(tiles, (0, 0), boustrophedon=True)
+
+    path = with_sweep.best_case.paths[0]
+    assert np.array_equal(path, stc_only.best_case.paths[0])
+    assert np.array_equal(path[0, :2], path[-1, 2:])
+    assert len(path) == np.count_nonzero(tile_region(tiles))
@@ -0,0 +1,48 @@
+import os
+import sys
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from kruskal import Kruskal, MST_MODES
+from CalculateTrajectories import CalculateTrajectories
+
+
+def stc_path(region: np.ndarray, start_tile: tuple, mode: int):
+    rows, cols = region.shape
+    k = Kruskal(rows, cols)
+    k.initializeGraph(region, True)
+    ct = CalculateTrajectories(rows, cols, k.performKruskal(mode))
+    ct.initializeGraph(np.repeat(np.repeat(region, 2, axis=0), 2, axis=1), True)
+    ct.RemoveTheAppropriateEdges()
+    ct.CalculatePathsSequence(4 * start_tile[0] * cols + 2 * start_tile[1])
+    return ct.PathSequence
+
+
+@pytest.mark.parametrize('mode', list(MST_MODES))
+@pytest.mark.parametrize('length', [2, 3, 7])
+def test_vertical_strip_in_one_column_window(length, mode):
+    # cropped robot windows of vertical strip regions are 1 column wide
+    path = stc_path(np.ones((length, 1), dtype=bool), (0, 0), mode)
+
+    # the STC path goes once around the strip over all of its 4 * length subcells
+    assert len(path) == 4 * length
+    visited = {(int(r), int(c)) for r, c in path[:, 2:]}
+    assert visited == {(r, c) for r in range(2 * length) for c in range(2)}
+
+
+@pytest.mark.parametrize('mode', list(MST_MODES))
+def test_one_column_window_matches_wider_window(mode):
+    region = np.zeros((5, 2), dtype=bool)
+    region[:, 0] = True
+
+    narrow_path = stc_path(region[:, :1], (0, 0), mode)
+    wide_path = stc_path(region, (0, 0), mode)
+    np.testing.assert_array_equal(narrow_path, wide_path)
+
+
+@pytest.mark.parametrize('mode', list(MST_MODES))
+def test_horizontal_strip_in_one_row_window(mode):
+    path = stc_path(np.ones((1, 4), dtype=bool), (0, 0), mode)
+    assert len(path) == 16
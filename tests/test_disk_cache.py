@@ -0,0 +1,37 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from disk_cache import DiskCache
+
+
+def entry_size(tmp_path):
+    probe = DiskCache(str(tmp_path / 'probe'))
+    probe.store('probe', b'x' * 1000)
+    return probe.size()
+
+
+def test_make_key_keeps_part_boundaries_apart():
+    assert DiskCache.make_key('ab', 'c') != DiskCache.make_key('a', 'bc')
+    assert DiskCache.make_key(b'ab', 1) == DiskCache.make_key(b'ab', 1)
+    assert DiskCache.make_key(1) != DiskCache.make_key('1')
+
+
+def test_least_recently_used_entries_get_evicted_above_the_size_limit(tmp_path):
+    size = entry_size(tmp_path)
+    cache = DiskCache(str(tmp_path / 'cache'), max_size_bytes=3 * size)
+
+    for key in ('a', 'b', 'c'):
+        cache.store(key, b'x' * 1000)
+        # distinct modification times, the recency order comes from them
+        os.utime(os.path.join(cache.directory, f'{key}.pkl'), (time.time() - 100 + ord(key), ) * 2)
+    # reading 'a' makes it the most recently used entry
+    assert cache.load('a') == b'x' * 1000
+
+    cache.store('d', b'x' * 1000)
+
+    assert 'b' not in cache
+    assert all(key in cache for key in ('a', 'c', 'd'))
+    assert cache.size() <= 3 * size
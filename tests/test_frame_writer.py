@@ -0,0 +1,33 @@
+import os
+import sys
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from frame_writer import BackgroundFrameWriter
+
+
+def test_frames_get_written(tmp_path):
+    writer = BackgroundFrameWriter(tmp_path / 'frames.gif', frame_stride=1)
+    for iteration in range(3):
+        writer.add_frame(iteration, np.arange(12, dtype=np.int64).reshape(3, 4) + iteration)
+    writer.close()
+    assert (tmp_path / 'frames.gif').stat().st_size > 0
+
+
+def test_writer_error_gets_raised_instead_of_blocking(tmp_path, monkeypatch):
+    writer = BackgroundFrameWriter(tmp_path / 'frames.gif', frame_stride=1, queue_size=2)
+
+    def failing_append_data(image):
+        raise OSError("disk full")
+    monkeypatch.setattr(writer.gif_writer, 'append_data', failing_append_data)
+
+    # without error propagation the third frame would wait forever for the dead writer
+    with pytest.raises(RuntimeError) as error:
+        for iteration in range(100):
+            writer.add_frame(iteration, np.ones((3, 4), dtype=np.int64))
+    assert isinstance(error.value.__cause__, OSError)
+
+    with pytest.raises(RuntimeError):
+        writer.close()
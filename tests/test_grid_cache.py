@@ -0,0 +1,49 @@
+import os
+import sys
+from shapely.geometry import box
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from disk_cache import DiskCache
+from grid_generation import Grid_Settings_Task_Manager, generate_grid_per_line_width
+
+
+AREA = box(13.650, 50.900, 13.653, 50.902)
+
+
+def grid_offsets(grid_cache):
+    """
+    :return: (longitude, latitude) offset per scanner line width of a grid generation run
+    """
+    task_manager = Grid_Settings_Task_Manager([20, 10], [1, 1], AREA)
+    return {int(gdf.sensor_line_length_meter.iloc[0]): (gdf.offset_longitude.iloc[0], gdf.offset_latitude.iloc[0])
+            for gdf in generate_grid_per_line_width(task_manager, grid_cache)}
+
+
+def cache_keys(cache_directory):
+    return [file_name[:-len('.pkl')] for file_name in os.listdir(cache_directory) if file_name.endswith('.pkl')]
+
+
+def test_cached_grids_are_reused_with_their_offset(tmp_path):
+    grid_cache = DiskCache(str(tmp_path))
+    offsets = grid_offsets(grid_cache)
+    assert sorted(offsets) == [10, 20]
+    assert offsets[10] == offsets[20]
+
+    assert grid_offsets(grid_cache) == offsets
+    assert len(cache_keys(tmp_path)) == 2
+
+
+def test_smaller_grid_follows_a_regenerated_bigger_grid(tmp_path):
+    grid_cache = DiskCache(str(tmp_path))
+    first_offsets = grid_offsets(grid_cache)
+
+    # the biggest grid gets a new random offset, the cached 10 m grid of the old offset must not be used with it
+    for key in cache_keys(tmp_path):
+        if int(grid_cache.load(key).sensor_line_length_meter.iloc[0]) == 20:
+            grid_cache.invalidate(key)
+    offsets = grid_offsets(grid_cache)
+
+    assert offsets[20] != first_offsets[20]
+    assert offsets[10] == offsets[20]
+    assert len(cache_keys(tmp_path)) == 3
@@ -0,0 +1,16 @@
+import os
+import sys
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from turns import path_statistics
+
+
+def test_mission_time_uses_subcell_length_speed_and_turns():
+    # 3 moves right, 2 moves down: 5 subcells, 1 turn
+    path = np.array([[0, 0, 0, 1], [0, 1, 0, 2], [0, 2, 0, 3], [0, 3, 1, 3], [1, 3, 2, 3]], dtype=np.int32)
+    statistics = path_statistics([path], subcell_length=5.0, speed=2.0, turn_duration=4.0)
+
+    assert statistics['turns'].tolist() == [1]
+    assert statistics['mission_time'].tolist() == [5 * 5.0 / 2.0 + 4.0]
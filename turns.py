@@ -1,39 +1,93 @@
 import numpy as np
+from path_collection import PathCollection
+
+
+def path_statistics(paths, subcell_length: float = 1.0, speed: float = 1.0, turn_duration: float = 0.0):
+    """
+    Turn and length statistics of many paths at once, vectorized over all moves of all paths.
+
+    A turn is a change between horizontal and vertical moves, like in turns.count_turns.
+
+    :param paths: PathCollection (or list of (N x 4) path arrays), e.g. the paths of all robots in all modes
+
+    :param subcell_length: length of one move (one subcell) in meter
+
+    :param speed: drone speed in meter per second
+
+    :param turn_duration: additional time in seconds the drone needs for one turn
+
+    :return: dict of 'turns' (int array, -1 for an empty path), 'length' (moves per path), 'straight_runs' (list of
+    int arrays with the number of moves of every straight run per path) and 'mission_time' (seconds per path)
+    """
+    if not isinstance(paths, PathCollection):
+        paths = PathCollection.from_paths(paths)
+    lengths = paths.lengths
+    moves = paths.moves
+    path_ids = paths.path_ids
+
+    # a straight run starts with the first move of a path and with every change of the move direction
+    horizontal = moves[:, 0] == moves[:, 2]
+    run_starts = np.ones(len(moves), dtype=bool)
+    run_starts[1:] = (horizontal[1:] != horizontal[:-1]) | (path_ids[1:] != path_ids[:-1])
+    run_start_idx = np.flatnonzero(run_starts)
+    run_lengths = np.diff(np.append(run_start_idx, len(moves)))
+    runs_per_path = np.bincount(path_ids[run_start_idx], minlength=len(paths))
+
+    path_turns = runs_per_path - 1
+    mission_time = lengths * subcell_length / speed + np.maximum(path_turns, 0) * turn_duration
+
+    return {'turns': path_turns,
+            'length': lengths,
+            'straight_runs': np.split(run_lengths, np.cumsum(runs_per_path)[:-1]),
+            'mission_time': mission_time}
+
+
+def take_statistics(statistics: dict, indices):
+    """
+    Statistics of a subset of the paths of a path_statistics result.
+    """
+    return {key: [value[i] for i in indices] if key == 'straight_runs' else value[indices]
+            for key, value in statistics.items()}
 
 
 class turns:
     def __init__(self, paths):
         """
-        paths: List of lists of moves per drone
+        paths: PathCollection of the moves per drone
         """
         self.std = None
         self.avg = None
         self.paths = paths
         self.turns = []
+        self.lengths = None
+        self.straight_runs = None
+        self.mission_times = None
 
     def __str__(self):
-        return (
+        text = (
             '\n'
             f'Turns: {self.turns}\n'
             f'Average: {self.avg:.3f}\n'
             f'Standard Deviation: {self.std:.3f}\n')
+        if self.lengths is not None:
+            text += (
+                f'Path Lengths: {self.lengths}\n'
+                f'Longest Straight Run: {[int(runs.max(initial=0)) for runs in self.straight_runs]}\n'
+                f'Estimated Mission Times (sec): {np.round(self.mission_times, 1).tolist()}\n')
+        return text
 
     def count_turns(self):
-        for path in self.paths:
-            num_turns = -1
-            current_move = ""
-            last_move = ""
-            for move in path:
-                if move[0] == move[2]:
-                    current_move = "horizontal"
-                elif move[1] == move[3]:
-                    current_move = "vertical"
-
-                if last_move != current_move:
-                    num_turns += 1
-
-                last_move = current_move
-            self.turns.append(num_turns)
+        self.turns = path_statistics(self.paths)['turns'].tolist()
+
+    def set_statistics(self, statistics: dict):
+        """
+        Take over the statistics of the paths from a path_statistics result, e.g. take_statistics of the result for
+        all modes.
+        """
+        self.turns = statistics['turns'].tolist()
+        self.lengths = statistics['length'].tolist()
+        self.straight_runs = statistics['straight_runs']
+        self.mission_times = statistics['mission_time']
 
     def find_avg_and_std(self):
         self.avg = np.average(self.turns)
@@ -0,0 +1,59 @@
+import os
+import sys
+import time
+import numpy as np
+
+
+os.environ['PYGAME_HIDE_SUPPORT_PROMPT'] = "hide"
+
+
+def warm_up_darp_kernels():
+    """
+    Compile every numba kernel of DARP once for this environment.
+
+    All kernels carry explicit type signatures and cache=True, so importing darp compiles them eagerly and writes the
+    machine code into the numba cache (__pycache__ next to the sources or NUMBA_CACHE_DIR).
+    Every later process, e.g. every worker of a parallel batch run, only loads the cached kernels.
+    A tiny DARP run afterwards makes sure the kernels really work in this environment.
+    """
+    measure_start = time.time()
+    from darp import DARP
+    measure_end = time.time()
+    print("Compiled / loaded DARP numba kernels in", (measure_end - measure_start), "sec")
+
+    area = np.ones((6, 6), dtype=bool)
+    dict_darp_startparameter = {0: {'row': 0, 'col': 0, 'tiles_count': 17},
+                                1: {'row': 5, 'col': 5, 'tiles_count': 17}}
+
+    measure_start = time.time()
+    for importance in (False, True):
+        darp_instance = DARP(area, 100, 0.01, 0.0001, 10, dict_darp_startparameter, None, importance, False, False,
+                             'warm_up')
+        darp_instance.divideRegions()
+    measure_end = time.time()
+    print("Warm up DARP run finished in", (measure_end - measure_start), "sec")
+
+
+def warm_up_path_kernels():
+    """
+    Compile every numba kernel of the path planning (MST) once for this environment.
+    """
+    measure_start = time.time()
+    from kruskal import Kruskal
+    from CalculateTrajectories import CalculateTrajectories
+    measure_end = time.time()
+    print("Compiled / loaded path planning numba kernels in", (measure_end - measure_start), "sec")
+
+    k = Kruskal(4, 4)
+    k.initializeGraph(np.ones((4, 4), dtype=bool), True)
+    ct = CalculateTrajectories(4, 4, k.performKruskal(0))
+    ct.initializeGraph(np.ones((8, 8), dtype=bool), True)
+    ct.RemoveTheAppropriateEdges()
+    ct.CalculatePathsSequence(0)
+
+
+if __name__ == '__main__':
+    warm_up_darp_kernels()
+    warm_up_path_kernels()
+
+    sys.exit(0)